@@ -1,29 +1,61 @@
-import json
 import re
 import os
 import sys
-import spacy
-from typing import Tuple, List
+import atexit
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Tuple, List, Optional
 
 # Add project root to sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from refinery.lexicon import DEFAULT_ACRONYMS_PATH, DEFAULT_CUSTOM_ACRONYMS_PATH, load_lexicon
+from refinery.nlp import load_nlp
+
 print("DEBUG: Loaded updated ClaimProcessor with Search Quality Fixes (Final V2)")
 
+# Shared worker pool for process_claims(n_process > 1); created on first use and reused until
+# a call needs a different size or processor configuration.
+_pool = None
+_pool_key = None
+_pool_lock = threading.Lock()
+_worker_processor = None
+
+def _init_claim_worker(acronyms_file, custom_acronyms_file, nlp_mode):
+    global _worker_processor
+    _worker_processor = ClaimProcessor(acronyms_file, custom_acronyms_file, nlp_mode)
+
+def _process_claim_batch(claims: List[str]) -> List[Tuple[str, List[str]]]:
+    return _worker_processor._process_batch(claims, len(claims))
+
+def _get_pool(key, n_process: int) -> ProcessPoolExecutor:
+    global _pool, _pool_key
+    with _pool_lock:
+        if _pool is None or _pool_key != key:
+            if _pool is not None:
+                _pool.shutdown()
+            _pool = ProcessPoolExecutor(max_workers=n_process, initializer=_init_claim_worker, initargs=key[1:])
+            _pool_key = key
+        return _pool
+
+@atexit.register
+def _shutdown_pool():
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+
 class ClaimProcessor:
-    def __init__(self, acronyms_file: str = "refinery/acronyms_final.json", custom_acronyms_file: str = "refinery/custom_acronyms.json"):
-        self.acronyms = {}
-        self._load_acronyms(acronyms_file)
-        self._load_custom_acronyms(custom_acronyms_file)
+    def __init__(self, acronyms_file: str = DEFAULT_ACRONYMS_PATH, custom_acronyms_file: str = DEFAULT_CUSTOM_ACRONYMS_PATH,
+                 nlp_mode: Optional[str] = None):
+        self.acronyms_file = acronyms_file
+        self.custom_acronyms_file = custom_acronyms_file
+        self.nlp_mode = nlp_mode
+        # Acronyms with the custom phrases layered on top, from the shared compiled lexicon
+        self.lexicon = load_lexicon(acronyms_file, custom_acronyms_file)
+        self.acronyms = self.lexicon.forward
         
-        # Load SpaCy model
-        try:
-            self.nlp = spacy.load("en_core_web_sm")
-        except OSError:
-            print("Downloading spaCy model...")
-            from spacy.cli import download
-            download("en_core_web_sm")
-            self.nlp = spacy.load("en_core_web_sm")
+        # Only tokens and is_stop/is_punct are used, so the default mode skips the full pipeline
+        self.nlp = load_nlp(nlp_mode)
         
         self.legalese_phrases = [
             r"\bcomprising\b", r"\bconsisting of\b", r"\bwherein\b", r"\bcharacterized in that\b",
@@ -31,6 +63,9 @@ class ClaimProcessor:
             r"\ba plurality of\b", r"\bconfigured to\b", r"\badapted to\b", r"\bmethod for\b",
             r"\bsystem for\b", r"\bapparatus for\b", r"\bmethod\b", r"\bsystem\b", r"\bapparatus\b"
         ]
+        # One alternation in the same order, so longer phrases still win over their prefixes
+        self.legalese_pattern = re.compile("|".join(self.legalese_phrases), re.IGNORECASE)
+        self.whitespace_pattern = re.compile(r"\s+")
 
         self.domain_constraints = {
             "SIDELINK": ["sidelink", "v2x", "pc5", "prose", "device-to-device", "d2d"],
@@ -45,39 +80,41 @@ class ClaimProcessor:
             "POLAR", "LDPC", "PUCCH", "PUSCH"
         ]
 
-    def _load_acronyms(self, path: str):
-        if os.path.exists(path):
-            with open(path, 'r', encoding='utf-8') as f:
-                self.acronyms = json.load(f)
-        else:
-            print(f"Warning: Acronyms file {path} not found. Using empty dict.")
-
-    def _load_custom_acronyms(self, path: str):
-        if os.path.exists(path):
-            with open(path, 'r', encoding='utf-8') as f:
-                custom = json.load(f)
-                self.acronyms.update(custom)
-        else:
-            pass
-
     def process_claim(self, claim_text: str) -> Tuple[str, List[str]]:
-        cleaned_text = claim_text.lower()
-        for pattern in self.legalese_phrases:
-            cleaned_text = re.sub(pattern, "", cleaned_text, flags=re.IGNORECASE)
-        
-        cleaned_text = re.sub(r"\s+", " ", cleaned_text).strip()
+        return self._build_query(self.nlp(self._clean(claim_text)))
+
+    def process_claims(self, claims: Iterable[str], batch_size: int = 64, n_process: int = 1) -> List[Tuple[str, List[str]]]:
+        """
+        Processes many claims, returning (query, constraints) pairs in input order.
+
+        Claims are tokenized in batches with nlp.pipe. With n_process > 1 (-1 = all cores),
+        batches are spread over a shared process pool whose workers each hold their own
+        ClaimProcessor, so cleaning, tokenization and query building all run in parallel.
+        """
+        if n_process == -1:
+            n_process = os.cpu_count() or 1
+        if n_process <= 1:
+            return self._process_batch(claims, batch_size)
+
+        key = (n_process, self.acronyms_file, self.custom_acronyms_file, self.nlp_mode)
+        pool = _get_pool(key, n_process)
+        results = []
+        for batch_results in pool.map(_process_claim_batch, _batches(claims, batch_size)):
+            results.extend(batch_results)
+        return results
+
+    def _process_batch(self, claims: Iterable[str], batch_size: int) -> List[Tuple[str, List[str]]]:
+        cleaned = (self._clean(claim) for claim in claims)
+        return [self._build_query(doc) for doc in self.nlp.pipe(cleaned, batch_size=batch_size)]
+
+    def _clean(self, claim_text: str) -> str:
+        cleaned_text = self.legalese_pattern.sub("", claim_text.lower())
+        cleaned_text = self.whitespace_pattern.sub(" ", cleaned_text).strip()
         
         # 1.5. Custom Phrase Replacement
-        custom_phrases = [k for k in self.acronyms.keys() if " " in k or "-" in k]
-        custom_phrases.sort(key=len, reverse=True)
-        
-        for phrase in custom_phrases:
-            pattern = re.compile(re.escape(phrase), re.IGNORECASE)
-            if pattern.search(cleaned_text):
-                cleaned_text = pattern.sub(self.acronyms[phrase], cleaned_text)
-        
-        doc = self.nlp(cleaned_text)
-        
+        return self._replace_phrases(cleaned_text)
+
+    def _build_query(self, doc) -> Tuple[str, List[str]]:
         tokens = []
         for token in doc:
             if token.is_stop or token.is_punct or token.is_space:
@@ -117,6 +154,27 @@ class ClaimProcessor:
         final_query = " ".join(final_tokens)
         return final_query, list(constraints)
 
+    def _replace_phrases(self, text: str) -> str:
+        """Rewrites multi-word and hyphenated acronym keys (longest match first) in one pass."""
+        parts = []
+        position = 0
+        for start, end, index in self.lexicon.phrases.find_longest(text, word_boundaries=False):
+            parts.append(text[position:start])
+            parts.append(self.acronyms.value_at(index))
+            position = end
+        parts.append(text[position:])
+        return "".join(parts)
+
+def _batches(items: Iterable[str], batch_size: int):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
 if __name__ == "__main__":
     processor = ClaimProcessor()
     claim = "A method comprising a UE configured to transmit a PUSCH to a gNB via device-to-device communication."
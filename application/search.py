@@ -9,8 +9,8 @@ from brain.search import HybridSearcher
 class SearchEngine:
     def __init__(self):
         # Initialize the real HybridSearcher
-        # Assuming the index is at ../brain/index.json
-        index_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'brain', 'index.json')
+        # Assuming the index is at ../brain/index
+        index_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'brain', 'index')
         self.searcher = HybridSearcher(index_path)
 
     def search(self, query, filters=None):
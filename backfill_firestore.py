@@ -1,43 +1,34 @@
 import os
 import hashlib
-import spacy
-from google.cloud import storage, firestore
-from crawler import config
+from google.cloud import firestore
+from brain.blobstore import get_blob_store
+from brain.indexer import ChunkingStrategy
 
 # Configuration
-BUCKET_NAME = 'invention-platform-data-001'
 PROJECT_ID = 'still-manifest-478014-c1'
 
 def backfill():
     print("Initializing Backfill...")
     db = firestore.Client(project=PROJECT_ID)
-    storage_client = storage.Client(project=PROJECT_ID)
-    bucket = storage_client.bucket(BUCKET_NAME)
+    store = get_blob_store()
     
-    # Load Spacy (Match Dataflow version)
-    try:
-        nlp = spacy.load("en_core_web_sm")
-    except:
-        from spacy.cli import download
-        download("en_core_web_sm")
-        nlp = spacy.load("en_core_web_sm")
+    # Same chunker as the Dataflow pipeline
+    chunker = ChunkingStrategy()
         
-    blobs = list(bucket.list_blobs(prefix='specs/processed/'))
-    print(f"Found {len(blobs)} specs to process.")
+    blob_names = [name for name in store.list('specs/processed/') if name.endswith('.txt')]
+    print(f"Found {len(blob_names)} specs to process.")
     
     batch = db.batch()
     batch_count = 0
     total_docs = 0
     
-    for blob in blobs:
-        if not blob.name.endswith('.txt'):
-            continue
-            
-        print(f"Processing {blob.name}...")
-        content = blob.download_as_text()
+    # Specs are downloaded a small parallel batch at a time, not all up front
+    for blob_name, data in store.iter_many(blob_names):
+        print(f"Processing {blob_name}...")
+        content = data.decode('utf-8')
         
-        path = f"gs://{BUCKET_NAME}/{blob.name}"
-        filename = blob.name.split('/')[-1]
+        path = store.uri(blob_name)
+        filename = blob_name.split('/')[-1]
         spec_name = filename.replace('.txt', '')
         
         metadata = {
@@ -46,45 +37,11 @@ def backfill():
             'type': 'Technical Specification'
         }
         
-        # EXACT REPLICATION OF DATAFLOW LOGIC
-        # -----------------------------------
-        doc = nlp(content[:1000000]) 
-        current_chunk = []
-        current_length = 0
-        
-        for sent in doc.sents:
-            sent_text = sent.text.strip()
-            if not sent_text:
-                continue
-                
-            current_chunk.append(sent_text)
-            current_length += len(sent_text)
-            
-            if current_length >= 500:
-                chunk_text = " ".join(current_chunk)
-                doc_id = hashlib.md5(chunk_text.encode('utf-8')).hexdigest()
-                
-                # Add to Batch
-                doc_ref = db.collection('3gpp_knowledge_base').document(doc_id)
-                batch.set(doc_ref, {
-                    'text': chunk_text,
-                    'metadata': metadata
-                })
-                batch_count += 1
-                total_docs += 1
-                
-                if batch_count >= 400:
-                    batch.commit()
-                    print(f"  Committed batch of 400 chunks. Total: {total_docs}")
-                    batch = db.batch()
-                    batch_count = 0
-                
-                current_chunk = []
-                current_length = 0
-        
-        if current_chunk:
-            chunk_text = " ".join(current_chunk)
+        for chunk in chunker.iter_chunks({'content': content, 'metadata': metadata}):
+            chunk_text = chunk['text']
             doc_id = hashlib.md5(chunk_text.encode('utf-8')).hexdigest()
+            
+            # Add to Batch
             doc_ref = db.collection('3gpp_knowledge_base').document(doc_id)
             batch.set(doc_ref, {
                 'text': chunk_text,
@@ -93,6 +50,12 @@ def backfill():
             batch_count += 1
             total_docs += 1
             
+            if batch_count >= 400:
+                batch.commit()
+                print(f"  Committed batch of 400 chunks. Total: {total_docs}")
+                batch = db.batch()
+                batch_count = 0
+            
     if batch_count > 0:
         batch.commit()
         print(f"Final batch committed. Total Docs: {total_docs}")
@@ -0,0 +1,325 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from crawler import config
+
+class BlobStore:
+    """
+    Minimal object store interface shared by the crawler and the pipelines.
+
+    Blob names are '/'-separated keys (e.g. 'specs/processed/38.211.txt'). Subclasses implement
+    the single-object operations; the bulk helpers fan them out over a thread pool.
+    """
+
+    def __init__(self, max_workers: int = config.STORAGE_MAX_WORKERS):
+        self.max_workers = max_workers
+
+    def put(self, name: str, data, content_type: str = 'application/octet-stream'):
+        """Stores str, bytes or a binary file object (read from its start) under name."""
+        raise NotImplementedError
+
+    def put_file(self, name: str, path: str, content_type: str = 'application/octet-stream'):
+        with open(path, 'rb') as f:
+            self.put(name, f, content_type)
+
+    def get(self, name: str) -> bytes:
+        raise NotImplementedError
+
+    def get_text(self, name: str) -> str:
+        return self.get(name).decode('utf-8')
+
+    def exists(self, name: str) -> bool:
+        raise NotImplementedError
+
+    def list(self, prefix: str = '') -> List[str]:
+        raise NotImplementedError
+
+    def uri(self, name: str) -> str:
+        raise NotImplementedError
+
+    def _run_parallel(self, fn, args_list, max_workers: Optional[int]):
+        workers = max(1, min(max_workers or self.max_workers, len(args_list)))
+        results = {}
+
+        def call(args):
+            try:
+                return args[0], fn(*args), None
+            except Exception as e:
+                return args[0], None, e
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for name, value, error in executor.map(call, args_list):
+                results[name] = (value, error)
+        return results
+
+    def _upload_parallel(self, fn, items, max_workers):
+        args_list = [tuple(item) for item in items]
+        if not args_list:
+            return []
+        results = self._run_parallel(fn, args_list, max_workers)
+        failed = []
+        for name, (_, error) in results.items():
+            if error is not None:
+                print(f'Failed to upload {name}: {error}')
+                failed.append(name)
+        return failed
+
+    def put_many(self, items: Iterable[Tuple], max_workers: Optional[int] = None) -> List[str]:
+        """
+        Uploads (name, data) or (name, data, content_type) tuples in parallel.
+        Returns the names that failed.
+        """
+        return self._upload_parallel(self.put, items, max_workers)
+
+    def put_files(self, items: Iterable[Tuple], max_workers: Optional[int] = None) -> List[str]:
+        """Uploads (name, local_path) or (name, local_path, content_type) tuples in parallel."""
+        return self._upload_parallel(self.put_file, items, max_workers)
+
+    def get_many(self, names: Iterable[str], max_workers: Optional[int] = None) -> Dict[str, bytes]:
+        """Downloads blobs in parallel. Blobs that fail to download are left out of the result."""
+        args_list = [(name,) for name in names]
+        if not args_list:
+            return {}
+        results = self._run_parallel(self.get, args_list, max_workers)
+        fetched = {}
+        for name, (value, error) in results.items():
+            if error is not None:
+                print(f'Failed to download {name}: {error}')
+            else:
+                fetched[name] = value
+        return fetched
+
+    def iter_many(self, names: Iterable[str], batch_size: Optional[int] = None) -> Iterator[Tuple[str, bytes]]:
+        """
+        Yields (name, data) in order, downloading batch_size blobs (default: max_workers) in
+        parallel at a time, so at most one batch is held in memory.
+        """
+        names = list(names)
+        batch_size = batch_size or self.max_workers
+        for start in range(0, len(names), batch_size):
+            batch = names[start : start + batch_size]
+            fetched = self.get_many(batch, max_workers=batch_size)
+            for name in batch:
+                if name in fetched:
+                    yield name, fetched.pop(name)
+
+class GCSBlobStore(BlobStore):
+    def __init__(self, bucket_name: str = config.GCS_BUCKET_NAME, project_id: str = config.PROJECT_ID, **kwargs):
+        super().__init__(**kwargs)
+        from google.cloud import storage
+
+        self.bucket_name = bucket_name
+        self.client = storage.Client(project=project_id)
+        self.bucket = self.client.bucket(bucket_name)
+
+    def put(self, name, data, content_type='application/octet-stream'):
+        blob = self.bucket.blob(name)
+        if isinstance(data, (str, bytes)):
+            blob.upload_from_string(data, content_type=content_type)
+        else:
+            if hasattr(data, 'seek'):
+                data.seek(0)
+            blob.upload_from_file(data, content_type=content_type)
+
+    def put_file(self, name, path, content_type='application/octet-stream'):
+        self.bucket.blob(name).upload_from_filename(path, content_type=content_type)
+
+    def get(self, name):
+        return self.bucket.blob(name).download_as_bytes()
+
+    def exists(self, name):
+        return self.bucket.blob(name).exists()
+
+    def list(self, prefix=''):
+        return [blob.name for blob in self.client.list_blobs(self.bucket_name, prefix=prefix)]
+
+    def uri(self, name):
+        return f'gs://{self.bucket_name}/{name}'
+
+class LocalBlobStore(BlobStore):
+    """Stores blobs as files under a root directory, mirroring the bucket layout."""
+
+    def __init__(self, root_dir: str = config.LOCAL_STORAGE_DIR, **kwargs):
+        super().__init__(**kwargs)
+        self.root_dir = os.path.abspath(root_dir)
+
+    def _path(self, name: str) -> str:
+        path = os.path.abspath(os.path.join(self.root_dir, *name.split('/')))
+        if os.path.commonpath([path, self.root_dir]) != self.root_dir:
+            raise ValueError(f'Blob name escapes the store root: {name}')
+        return path
+
+    def put(self, name, data, content_type='application/octet-stream'):
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a sibling temp file and rename so readers never see a partial blob
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                if isinstance(data, str):
+                    f.write(data.encode('utf-8'))
+                elif isinstance(data, bytes):
+                    f.write(data)
+                else:
+                    if hasattr(data, 'seek'):
+                        data.seek(0)
+                    shutil.copyfileobj(data, f, config.DOWNLOAD_CHUNK_SIZE)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def get(self, name):
+        with open(self._path(name), 'rb') as f:
+            return f.read()
+
+    def exists(self, name):
+        return os.path.isfile(self._path(name))
+
+    def list(self, prefix=''):
+        names = []
+        for root, _, files in os.walk(self.root_dir):
+            for filename in files:
+                if filename.startswith('.upload-'):
+                    continue
+                rel = os.path.relpath(os.path.join(root, filename), self.root_dir)
+                name = rel.replace(os.sep, '/')
+                if name.startswith(prefix):
+                    names.append(name)
+        return sorted(names)
+
+    def uri(self, name):
+        return f'file://{self._path(name)}'
+
+def sha256_of(data) -> str:
+    """Hashes str, bytes or a binary file object (read from its start, then rewound)."""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    if isinstance(data, bytes):
+        return hashlib.sha256(data).hexdigest()
+    digest = hashlib.sha256()
+    data.seek(0)
+    for block in iter(lambda: data.read(config.DOWNLOAD_CHUNK_SIZE), b''):
+        digest.update(block)
+    data.seek(0)
+    return digest.hexdigest()
+
+class ContentAddressedStore:
+    """
+    Deduplicating front for a BlobStore.
+
+    put() stores bytes once under <prefix><hash[:2]>/<hash> and maps the logical name to that
+    hash, so an artifact already stored under any name is never uploaded again.
+    put_if_changed() keeps the logical name as the blob key (for outputs other jobs read by name)
+    but skips the upload when the recorded hash for that name is unchanged.
+
+    The hash index lives in a local JSON file mirrored to a single blob, like the crawl manifest.
+    """
+
+    def __init__(self, store: BlobStore,
+                 index_path: str = config.CAS_INDEX_PATH,
+                 index_blob: str = config.CAS_INDEX_BLOB,
+                 prefix: str = config.CAS_PREFIX):
+        self.store = store
+        self.index_path = index_path
+        self.index_blob = index_blob
+        self.prefix = prefix
+        self.names: Dict[str, str] = {}
+        self.objects: Dict[str, int] = {}
+        self.dirty = False
+        self._lock = threading.Lock()
+
+    def object_name(self, digest: str) -> str:
+        return f'{self.prefix}{digest[:2]}/{digest}'
+
+    def load(self):
+        payload = None
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+        else:
+            try:
+                if self.store.exists(self.index_blob):
+                    payload = json.loads(self.store.get_text(self.index_blob))
+            except Exception as e:
+                print(f'Warning: Failed to fetch content hash index: {e}')
+        if payload:
+            self.names = payload.get('names', {})
+            self.objects = payload.get('objects', {})
+        print(f'Content hash index: {len(self.objects)} objects, {len(self.names)} names.')
+
+    def save(self):
+        if not self.dirty:
+            return
+        with self._lock:
+            payload = json.dumps({'names': self.names, 'objects': self.objects}, indent=2, sort_keys=True)
+            self.dirty = False
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        tmp_path = f'{self.index_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(payload)
+        os.replace(tmp_path, self.index_path)
+        try:
+            self.store.put(self.index_blob, payload, 'application/json')
+        except Exception as e:
+            print(f'Warning: Failed to upload content hash index: {e}')
+
+    def _size_of(self, data) -> int:
+        if isinstance(data, str):
+            return len(data.encode('utf-8'))
+        if isinstance(data, bytes):
+            return len(data)
+        data.seek(0, os.SEEK_END)
+        size = data.tell()
+        data.seek(0)
+        return size
+
+    def _record(self, name: str, digest: str, size: int):
+        with self._lock:
+            self.names[name] = digest
+            self.objects[digest] = size
+            self.dirty = True
+
+    def put(self, name: str, data, content_type: str = 'application/octet-stream', digest: Optional[str] = None) -> Tuple[str, bool]:
+        """Stores data by content hash. Returns (hash, uploaded)."""
+        digest = digest or sha256_of(data)
+        object_name = self.object_name(digest)
+
+        with self._lock:
+            known = digest in self.objects
+        # An object missing from a lost or stale index is still detected with one existence check
+        if not known and not self.store.exists(object_name):
+            self.store.put(object_name, data, content_type)
+            uploaded = True
+        else:
+            uploaded = False
+
+        self._record(name, digest, self._size_of(data))
+        return digest, uploaded
+
+    def put_if_changed(self, name: str, data, content_type: str = 'application/octet-stream', digest: Optional[str] = None) -> Tuple[str, bool]:
+        """Stores data under name unless that name already holds the same bytes. Returns (hash, uploaded)."""
+        digest = digest or sha256_of(data)
+        with self._lock:
+            unchanged = self.names.get(name) == digest
+        if unchanged:
+            return digest, False
+
+        self.store.put(name, data, content_type)
+        self._record(name, digest, self._size_of(data))
+        return digest, True
+
+def get_blob_store(backend: Optional[str] = None) -> BlobStore:
+    """Returns the configured storage backend ('gcs' or 'local')."""
+    backend = backend or config.STORAGE_BACKEND
+    if backend == 'gcs':
+        return GCSBlobStore()
+    if backend == 'local':
+        return LocalBlobStore()
+    raise ValueError(f'Unknown storage backend: {backend}')
@@ -0,0 +1,128 @@
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+
+# rank_bm25.BM25Okapi defaults
+K1 = 1.5
+B = 0.75
+EPSILON = 0.25
+
+def tokenize(text: str) -> List[str]:
+    """The searcher's BM25 tokenization: lowercased, split on single spaces."""
+    return text.lower().split(' ')
+
+class Postings:
+    """
+    Term postings of one index segment.
+
+    terms are in first-occurrence order; the documents containing terms[i] are
+    docs[offsets[i]:offsets[i + 1]] (ascending) with the term's frequency in each at the same
+    positions of tfs. doc_lens holds every document's token count.
+    """
+
+    def __init__(self, terms: List[str], offsets: np.ndarray, docs: np.ndarray, tfs: np.ndarray, doc_lens: np.ndarray):
+        self.terms = terms
+        self.offsets = offsets
+        self.docs = docs
+        self.tfs = tfs
+        self.doc_lens = doc_lens
+        self.count = len(doc_lens)
+
+    @classmethod
+    def build(cls, texts: Iterable[str]) -> 'Postings':
+        builder = PostingsBuilder()
+        for text in texts:
+            builder.add(text)
+        return builder.build()
+
+class PostingsBuilder:
+    """Collects (term, doc, frequency) triples document by document; build() groups them by term."""
+
+    def __init__(self):
+        self._term_ids: Dict[str, int] = {}
+        self._terms = array('i')
+        self._docs = array('i')
+        self._tfs = array('i')
+        self._doc_lens = array('i')
+
+    def add(self, text: str):
+        doc = len(self._doc_lens)
+        tokens = tokenize(text)
+        self._doc_lens.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            term_id = self._term_ids.setdefault(term, len(self._term_ids))
+            self._terms.append(term_id)
+            self._docs.append(doc)
+            self._tfs.append(tf)
+
+    def build(self) -> Postings:
+        term_ids = np.array(self._terms, dtype=np.int32)
+        # Stable, so each term's documents stay in ascending order
+        order = np.argsort(term_ids, kind='stable')
+        offsets = np.zeros(len(self._term_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(self._term_ids)), out=offsets[1:])
+        return Postings(
+            list(self._term_ids),
+            offsets,
+            np.array(self._docs, dtype=np.int32)[order],
+            np.array(self._tfs, dtype=np.int32)[order],
+            np.array(self._doc_lens, dtype=np.int32),
+        )
+
+class BM25Scorer:
+    """
+    Okapi BM25 over the live rows of one or more segments' postings.
+
+    Scores equal those of rank_bm25.BM25Okapi built over the tokenized live texts (same k1, b
+    and idf floor), but nothing is tokenized: document frequencies are summed from the
+    postings, less those of deleted rows, and a query only touches the postings of its terms.
+    """
+
+    def __init__(self, postings: Sequence[Postings], starts: np.ndarray, live: np.ndarray):
+        self.postings = postings
+        self.starts = starts
+        self.live = live
+        self.count = int(live.sum())
+        self._term_index = [{term: i for i, term in enumerate(p.terms)} for p in postings]
+
+        df: Dict[str, int] = {}
+        total_len = 0
+        for p, start in zip(postings, starts):
+            segment_live = live[start:start + p.count]
+            segment_df = np.diff(p.offsets)
+            if not segment_live.all():
+                dead = ~segment_live[p.docs]
+                posting_terms = np.repeat(np.arange(len(p.terms)), segment_df)
+                segment_df = segment_df - np.bincount(posting_terms[dead], minlength=len(p.terms))
+            total_len += int(p.doc_lens[segment_live].sum())
+            for term, n in zip(p.terms, segment_df.tolist()):
+                if n:
+                    df[term] = df.get(term, 0) + n
+        self.avgdl = total_len / self.count if self.count else 0.0
+
+        # BM25Okapi's idf: negative values are raised to EPSILON times the average idf
+        terms = list(df)
+        freqs = np.array([df[term] for term in terms], dtype=np.float64)
+        idf = np.log(self.count - freqs + 0.5) - np.log(freqs + 0.5)
+        if len(idf):
+            idf[idf < 0] = EPSILON * (idf.sum() / len(idf))
+        self.idf = dict(zip(terms, idf.tolist()))
+
+    def get_scores(self, query: List[str]) -> np.ndarray:
+        """BM25 score of every live row for a tokenized query."""
+        scores = np.zeros(len(self.live))
+        for q in query:
+            idf = self.idf.get(q) or 0
+            if not idf:
+                continue
+            for p, start, index in zip(self.postings, self.starts, self._term_index):
+                i = index.get(q)
+                if i is None:
+                    continue
+                docs = np.asarray(p.docs[p.offsets[i]:p.offsets[i + 1]])
+                tfs = np.asarray(p.tfs[p.offsets[i]:p.offsets[i + 1]])
+                doc_lens = p.doc_lens[docs]
+                scores[start + docs] += idf * (tfs * (K1 + 1) / (tfs + K1 * (1 - B + B * doc_lens / self.avgdl)))
+        return scores if self.count == len(scores) else scores[self.live]
@@ -0,0 +1,185 @@
+from array import array
+from typing import Any, Dict, Iterator, List, Optional
+
+NO_VALUE = -1
+
+class Chunk:
+    """
+    Lightweight view of one chunk in a ChunkStore.
+
+    Supports the dict-style access (chunk['text'], chunk['metadata']) the pipelines use for
+    plain chunk dicts; metadata is only materialized when asked for.
+    """
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store: 'ChunkStore', index: int):
+        self.store = store
+        self.index = index
+
+    @property
+    def text(self) -> str:
+        return self.store.texts[self.index]
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return self.store.metadata(self.index)
+
+    @property
+    def section(self) -> Optional[str]:
+        return self.store.section(self.index)
+
+    @property
+    def start(self) -> Optional[int]:
+        value = self.store.starts[self.index]
+        return None if value == NO_VALUE else value
+
+    @property
+    def end(self) -> Optional[int]:
+        value = self.store.ends[self.index]
+        return None if value == NO_VALUE else value
+
+    def __getitem__(self, key: str):
+        if key == 'text':
+            return self.text
+        if key == 'metadata':
+            return self.metadata
+        raise KeyError(key)
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'text': self.text, 'metadata': self.metadata}
+
+class ChunkStore:
+    """
+    Column-oriented collection of chunks.
+
+    Document-level metadata is stored once per document and chunks refer to it by index.
+    The per-chunk fields are the text, the document index, the section (interned, so each
+    distinct heading is stored once) and the character offsets of the chunk in its document.
+    Chunk metadata dicts are built on demand: the document's metadata plus 'section' when the
+    chunk has one, plus 'chunk_id' (position within the document) when with_chunk_ids is set.
+    """
+
+    def __init__(self, with_chunk_ids: bool = False):
+        self.with_chunk_ids = with_chunk_ids
+        self.documents: List[Dict[str, Any]] = []
+        self.section_names: List[str] = []
+        self._section_ids: Dict[str, int] = {}
+        self.texts: List[str] = []
+        self.doc_ids = array('i')
+        self.section_ids = array('i')
+        self.starts = array('q')
+        self.ends = array('q')
+        self.ordinals = array('i')
+        self._doc_counts: List[int] = []
+
+    def add_document(self, metadata: Dict[str, Any]) -> int:
+        """Registers a document's metadata and returns its index for add()."""
+        self.documents.append(metadata)
+        self._doc_counts.append(0)
+        return len(self.documents) - 1
+
+    def _intern_section(self, section: Optional[str]) -> int:
+        if section is None:
+            return NO_VALUE
+        section_id = self._section_ids.get(section)
+        if section_id is None:
+            section_id = len(self.section_names)
+            self.section_names.append(section)
+            self._section_ids[section] = section_id
+        return section_id
+
+    def add(self, text: str, doc: int, section: Optional[str] = None,
+            start: Optional[int] = None, end: Optional[int] = None):
+        self.texts.append(text)
+        self.doc_ids.append(doc)
+        self.section_ids.append(self._intern_section(section))
+        self.starts.append(NO_VALUE if start is None else start)
+        self.ends.append(NO_VALUE if end is None else end)
+        self.ordinals.append(self._doc_counts[doc])
+        self._doc_counts[doc] += 1
+
+    def extend(self, other: 'ChunkStore'):
+        """Appends all documents and chunks of another store."""
+        doc_offset = len(self.documents)
+        for metadata in other.documents:
+            self.add_document(metadata)
+        section_map = [self._intern_section(name) for name in other.section_names]
+        for i in range(len(other)):
+            section_id = other.section_ids[i]
+            self.texts.append(other.texts[i])
+            self.doc_ids.append(other.doc_ids[i] + doc_offset)
+            self.section_ids.append(NO_VALUE if section_id == NO_VALUE else section_map[section_id])
+            self.starts.append(other.starts[i])
+            self.ends.append(other.ends[i])
+            self.ordinals.append(other.ordinals[i])
+        for doc, count in enumerate(other._doc_counts):
+            self._doc_counts[doc + doc_offset] = count
+
+    def section(self, i: int) -> Optional[str]:
+        section_id = self.section_ids[i]
+        return None if section_id == NO_VALUE else self.section_names[section_id]
+
+    def metadata(self, i: int) -> Dict[str, Any]:
+        metadata = dict(self.documents[self.doc_ids[i]])
+        section_id = self.section_ids[i]
+        if section_id != NO_VALUE:
+            metadata['section'] = self.section_names[section_id]
+        if self.with_chunk_ids:
+            metadata['chunk_id'] = self.ordinals[i]
+        return metadata
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [Chunk(self, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('chunk index out of range')
+        return Chunk(self, index)
+
+    def __iter__(self) -> Iterator[Chunk]:
+        for i in range(len(self)):
+            yield Chunk(self, i)
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Materializes the chunks as {'text', 'metadata'} dicts."""
+        return [{'text': self.texts[i], 'metadata': self.metadata(i)} for i in range(len(self))]
+
+    def to_json(self) -> Dict[str, Any]:
+        """Returns a JSON-serializable column layout (see from_json)."""
+        return {
+            'with_chunk_ids': self.with_chunk_ids,
+            'documents': self.documents,
+            'sections': self.section_names,
+            'texts': self.texts,
+            'doc': self.doc_ids.tolist(),
+            'section': self.section_ids.tolist(),
+            'start': self.starts.tolist(),
+            'end': self.ends.tolist(),
+        }
+
+    @classmethod
+    def from_json(cls, payload: Dict[str, Any]) -> 'ChunkStore':
+        store = cls(with_chunk_ids=payload.get('with_chunk_ids', False))
+        for metadata in payload['documents']:
+            store.add_document(metadata)
+        for name in payload['sections']:
+            store._intern_section(name)
+        store.texts = list(payload['texts'])
+        store.doc_ids = array('i', payload['doc'])
+        store.section_ids = array('i', payload['section'])
+        store.starts = array('q', payload['start'])
+        store.ends = array('q', payload['end'])
+        for doc in store.doc_ids:
+            store.ordinals.append(store._doc_counts[doc])
+            store._doc_counts[doc] += 1
+        return store
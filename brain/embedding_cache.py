@@ -0,0 +1,208 @@
+import hashlib
+import os
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import uuid
+from array import array
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crawler import config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    text_md5 TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    mirrored INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (model, text_md5)
+);
+CREATE TABLE IF NOT EXISTS mirror_packs (
+    name TEXT PRIMARY KEY
+);
+"""
+
+# Mirror pack: header (magic, dimension, count), then per vector its raw md5 and float32 values
+PACK_MAGIC = b'EMB1'
+PACK_HEADER = struct.Struct('<4sII')
+MD5_SIZE = 16
+
+# SQLite's default limit on bound parameters is 999
+LOOKUP_BATCH = 500
+
+def text_key(text: str) -> str:
+    """Cache key of a chunk: the md5 of its text, the same hash used for chunk ids."""
+    return hashlib.md5(text.encode('utf-8')).hexdigest()
+
+def _to_blob(vector: Sequence[float]) -> bytes:
+    values = array('f', vector)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values.tobytes()
+
+def _from_blob(blob: bytes) -> List[float]:
+    values = array('f')
+    values.frombytes(blob)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values.tolist()
+
+class EmbeddingCache:
+    """
+    Durable cache of chunk embeddings in a SQLite database.
+
+    Vectors are stored as little-endian float32 blobs keyed by the embedding model name and the
+    md5 of the chunk text, so an unchanged chunk is never sent to the embedding API twice and a
+    model change starts from an empty cache.
+
+    With a mirror BlobStore, push() uploads the vectors added since the last push as one pack
+    object under mirror_prefix/<model>/ and pull() imports the packs this database has not seen
+    yet, so a fresh machine (or a Dataflow/cloud run) can start from a warm cache.
+    """
+
+    def __init__(self, path: str = config.EMBEDDING_CACHE_PATH, mirror=None,
+                 mirror_prefix: str = config.EMBEDDING_CACHE_PREFIX):
+        self.path = path
+        self.mirror = mirror
+        self.mirror_prefix = mirror_prefix
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def get_many(self, model: str, keys: Iterable[str]) -> Dict[str, List[float]]:
+        """Returns the cached vectors of the given text keys; missing keys are left out."""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), LOOKUP_BATCH):
+                batch = keys[i : i + LOOKUP_BATCH]
+                placeholders = ','.join('?' * len(batch))
+                rows = self.conn.execute(
+                    f'SELECT text_md5, vector FROM embeddings WHERE model = ? AND text_md5 IN ({placeholders})',
+                    [model] + batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = _from_blob(blob)
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, model: str, items: Iterable[Tuple[str, Sequence[float]]]):
+        """Stores (text key, vector) pairs."""
+        rows = [(model, key, _to_blob(vector)) for key, vector in items]
+        if not rows:
+            return
+        with self._lock:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO embeddings (model, text_md5, vector, mirrored) VALUES (?, ?, ?, 0)',
+                rows
+            )
+            self.conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+
+    def pull(self) -> int:
+        """Imports mirror packs not imported before. Returns the number of vectors added."""
+        if self.mirror is None:
+            return 0
+        with self._lock:
+            seen = {row[0] for row in self.conn.execute('SELECT name FROM mirror_packs')}
+        names = [name for name in self.mirror.list(self.mirror_prefix) if name not in seen]
+        if not names:
+            return 0
+
+        added = 0
+        for name, data in self.mirror.get_many(names).items():
+            model = name[len(self.mirror_prefix):].rsplit('/', 1)[0]
+            rows = list(self._read_pack(model, data))
+            with self._lock:
+                before = self.conn.total_changes
+                self.conn.executemany(
+                    'INSERT OR IGNORE INTO embeddings (model, text_md5, vector, mirrored) VALUES (?, ?, ?, 1)',
+                    rows
+                )
+                added += self.conn.total_changes - before
+                self.conn.execute('INSERT OR IGNORE INTO mirror_packs (name) VALUES (?)', (name,))
+                self.conn.commit()
+        print(f'Imported {added} cached embeddings from {len(names)} mirror pack(s).')
+        return added
+
+    def push(self) -> int:
+        """Uploads the vectors not mirrored yet, one pack per model. Returns the number uploaded."""
+        if self.mirror is None:
+            return 0
+        with self._lock:
+            rows = self.conn.execute(
+                'SELECT model, text_md5, vector FROM embeddings WHERE mirrored = 0 ORDER BY model'
+            ).fetchall()
+        if not rows:
+            return 0
+
+        by_model: Dict[str, list] = {}
+        for model, key, blob in rows:
+            by_model.setdefault(model, []).append((key, blob))
+
+        pushed = 0
+        for model, entries in by_model.items():
+            dimension = len(entries[0][1]) // 4
+            entries = [(key, blob) for key, blob in entries if len(blob) == dimension * 4]
+            name = f'{self.mirror_prefix}{model}/{int(time.time())}-{uuid.uuid4().hex[:8]}.pack'
+            self.mirror.put(name, self._write_pack(dimension, entries))
+            with self._lock:
+                self.conn.executemany(
+                    'UPDATE embeddings SET mirrored = 1 WHERE model = ? AND text_md5 = ?',
+                    [(model, key) for key, _ in entries]
+                )
+                # Our own pack needs no import on the next pull
+                self.conn.execute('INSERT OR IGNORE INTO mirror_packs (name) VALUES (?)', (name,))
+                self.conn.commit()
+            pushed += len(entries)
+        return pushed
+
+    @staticmethod
+    def _write_pack(dimension: int, entries: List[Tuple[str, bytes]]) -> bytes:
+        parts = [PACK_HEADER.pack(PACK_MAGIC, dimension, len(entries))]
+        for key, blob in entries:
+            parts.append(bytes.fromhex(key))
+            parts.append(blob)
+        return b''.join(parts)
+
+    @staticmethod
+    def _read_pack(model: str, data: bytes):
+        magic, dimension, count = PACK_HEADER.unpack_from(data)
+        if magic != PACK_MAGIC:
+            raise ValueError('Not an embedding cache pack')
+        record = MD5_SIZE + dimension * 4
+        offset = PACK_HEADER.size
+        for _ in range(count):
+            yield model, data[offset : offset + MD5_SIZE].hex(), data[offset + MD5_SIZE : offset + record]
+            offset += record
+
+    def close(self):
+        """Pushes pending vectors to the mirror (if any) and closes the database."""
+        self.push()
+        with self._lock:
+            self.conn.close()
+
+def get_embedding_cache(path: str = config.EMBEDDING_CACHE_PATH) -> EmbeddingCache:
+    """Opens the configured cache, mirrored to the blob store when EMBEDDING_CACHE_MIRROR is set."""
+    mirror = None
+    if config.EMBEDDING_CACHE_MIRROR:
+        from brain.blobstore import get_blob_store
+        mirror = get_blob_store()
+    cache = EmbeddingCache(path, mirror=mirror)
+    cache.pull()
+    return cache
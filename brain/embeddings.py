@@ -0,0 +1,106 @@
+import os
+import re
+import sys
+import zlib
+from typing import List, Optional
+
+import numpy as np
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crawler import config
+
+class EmbeddingBackend:
+    """
+    Turns texts into vectors.
+
+    `name` identifies the vector space (it keys the embedding cache, so vectors of different
+    backends never mix) and `remote` tells EmbeddingGenerator whether requests should go
+    through its thread pool, rate limiter and retries.
+    """
+    name = ''
+    dimension = 0
+    remote = False
+
+    def embed(self, texts: List[str], task_type: str = 'RETRIEVAL_DOCUMENT') -> List[List[float]]:
+        raise NotImplementedError
+
+class VertexEmbeddingBackend(EmbeddingBackend):
+    remote = True
+
+    def __init__(self, model_name: str = config.EMBEDDING_MODEL):
+        # Imported here so offline use never needs the Vertex SDK
+        from vertexai.language_models import TextEmbeddingModel, TextEmbeddingInput
+
+        self.name = model_name
+        self.dimension = config.EMBEDDING_DIMENSION
+        self._input = TextEmbeddingInput
+        self.model = TextEmbeddingModel.from_pretrained(model_name)
+
+    def embed(self, texts, task_type='RETRIEVAL_DOCUMENT'):
+        inputs = [self._input(text, task_type) for text in texts]
+        return [embedding.values for embedding in self.model.get_embeddings(inputs)]
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+    """
+    Deterministic CPU-only embeddings for offline runs, tests and benchmarks.
+
+    Words, word bigrams and character trigrams of words are hashed (crc32, so the result is
+    stable across processes and machines) into `dimension` signed buckets; counts are
+    log-scaled and the vector is L2-normalized. Texts sharing vocabulary get high cosine
+    similarity, unrelated texts stay near orthogonal, as with a learned model.
+    """
+
+    def __init__(self, dimension: int = config.EMBEDDING_DIMENSION):
+        self.name = f'local-hash-{dimension}'
+        self.dimension = dimension
+
+    def _features(self, text: str) -> List[bytes]:
+        words = [word.encode('utf-8') for word in TOKEN_PATTERN.findall(text.lower())]
+        features = [b'w:' + word for word in words]
+        features += [b'b:' + first + b' ' + second for first, second in zip(words, words[1:])]
+        for word in words:
+            padded = b'<' + word + b'>'
+            features += [b'c:' + padded[i : i + 3] for i in range(len(padded) - 2)]
+        return features
+
+    def embed_one(self, text: str) -> List[float]:
+        hashes = np.fromiter((zlib.crc32(feature) for feature in self._features(text)), dtype=np.uint64)
+        vector = np.zeros(self.dimension)
+        if hashes.size:
+            buckets = (hashes % self.dimension).astype(np.intp)
+            signs = np.where((hashes // self.dimension) & 1, -1.0, 1.0)
+            vector = np.bincount(buckets, weights=signs, minlength=self.dimension)
+            vector = np.sign(vector) * np.log1p(np.abs(vector))
+            norm = np.linalg.norm(vector)
+            if norm:
+                vector /= norm
+        return vector.astype(np.float32).tolist()
+
+    def embed(self, texts, task_type='RETRIEVAL_DOCUMENT'):
+        return [self.embed_one(text) for text in texts]
+
+EMBEDDING_BACKENDS = ('auto', 'vertex', 'local')
+
+def get_embedding_backend(backend: Optional[str] = None, model_name: str = config.EMBEDDING_MODEL) -> EmbeddingBackend:
+    """
+    Returns the configured embedding backend ('auto', 'vertex' or 'local').
+
+    'vertex' raises if Vertex AI cannot be loaded; only 'auto' falls back to the local backend
+    (with a warning). Either way the returned backend's name says which space its vectors are in.
+    """
+    backend = backend or config.EMBEDDING_BACKEND
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f'Unknown embedding backend: {backend}')
+    if backend == 'vertex':
+        return VertexEmbeddingBackend(model_name)
+    if backend == 'auto':
+        try:
+            return VertexEmbeddingBackend(model_name)
+        except Exception as e:
+            print(f'Error loading model {model_name}: {e}')
+            print('Warning: Vertex AI unavailable. Using local hashed embeddings.')
+    return HashingEmbeddingBackend()
@@ -0,0 +1,761 @@
+import argparse
+import json
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crawler import config
+from brain.bm25 import BM25Scorer, Postings, PostingsBuilder
+
+# Index directory layout
+META_FILE = 'meta.json'          # format, count, dimension, metadata fields and their value dictionaries
+VECTORS_FILE = 'vectors.f32'     # count x dimension float32 matrix of unit-length rows, row-major, no header
+TEXTS_FILE = 'texts.bin'         # chunk texts, UTF-8, concatenated
+OFFSETS_FILE = 'offsets.npy'     # int64, count + 1 byte offsets into texts.bin
+CODES_FILE = 'codes.npy'         # int32, fields x count dictionary codes (NO_VALUE: field absent)
+# BM25 postings (see brain.bm25.Postings), so loading an index never tokenizes its texts
+TERMS_FILE = 'terms.bin'                   # terms, UTF-8, concatenated
+TERM_OFFSETS_FILE = 'term_offsets.npy'     # int64, terms + 1 byte offsets into terms.bin
+POSTING_OFFSETS_FILE = 'posting_offsets.npy'  # int64, terms + 1 offsets into postings.npy
+POSTINGS_FILE = 'postings.npy'             # int32, 2 x postings: document rows, term frequencies
+DOC_LENS_FILE = 'doc_lens.npy'             # int32, count token counts
+INDEX_FILES = (META_FILE, VECTORS_FILE, TEXTS_FILE, OFFSETS_FILE, CODES_FILE,
+               TERMS_FILE, TERM_OFFSETS_FILE, POSTING_OFFSETS_FILE, POSTINGS_FILE, DOC_LENS_FILE)
+
+# Segmented index layout: a manifest naming the live segments (each an index directory as
+# above) and, per segment, an optional file of deleted row numbers
+MANIFEST_FILE = 'manifest.json'
+SEGMENTS_DIR = 'segments'
+TOMBSTONES_DIR = 'tombstones'
+
+INDEX_FORMAT = 1
+NO_VALUE = -1
+
+def _value_key(value: Any) -> str:
+    # Metadata values may be unhashable (lists); their JSON form identifies them
+    return json.dumps(value, sort_keys=True, ensure_ascii=False)
+
+def is_index_dir(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, META_FILE))
+
+class IndexWriter:
+    """
+    Writes an index directory chunk by chunk.
+
+    Vectors are normalized to unit length when written, so a dot product with a unit query is
+    its cosine similarity. Vectors and texts are appended to their files as chunks arrive; only the text offsets and
+    metadata codes (a few bytes per chunk) are kept in memory. Everything is written to a
+    sibling temporary directory that replaces `path` on close(), so readers never see a
+    half-written index.
+    """
+
+    def __init__(self, path: str, dimension: Optional[int] = None, embedding_model: Optional[str] = None):
+        self.path = path
+        self.dimension = dimension
+        self.embedding_model = embedding_model
+        self.count = 0
+        self.tmp_path = path.rstrip('/\\') + '.tmp'
+        if os.path.exists(self.tmp_path):
+            shutil.rmtree(self.tmp_path)
+        os.makedirs(self.tmp_path)
+        self._vectors = open(os.path.join(self.tmp_path, VECTORS_FILE), 'wb')
+        self._texts = open(os.path.join(self.tmp_path, TEXTS_FILE), 'wb')
+        self._offsets = array('q', [0])
+        self._fields: Dict[str, array] = {}
+        self._dictionaries: Dict[str, List[Any]] = {}
+        self._value_codes: Dict[str, Dict[str, int]] = {}
+        self._postings = PostingsBuilder()
+
+    def add(self, text: str, embedding: Sequence[float], metadata: Dict[str, Any]):
+        vector = np.asarray(embedding, dtype=np.float32)
+        if self.dimension is None:
+            self.dimension = len(vector)
+        if vector.shape != (self.dimension,):
+            raise ValueError(f'Expected a {self.dimension}-dimensional embedding, got shape {vector.shape}')
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector = vector / norm
+        self._vectors.write(vector.tobytes())
+
+        encoded = text.encode('utf-8')
+        self._texts.write(encoded)
+        self._offsets.append(self._offsets[-1] + len(encoded))
+        self._postings.add(text)
+
+        for field, value in metadata.items():
+            codes = self._fields.get(field)
+            if codes is None:
+                # Rows added before the field first appeared do not have it
+                codes = self._fields[field] = array('i', [NO_VALUE]) * self.count
+                self._dictionaries[field] = []
+                self._value_codes[field] = {}
+            key = _value_key(value)
+            code = self._value_codes[field].get(key)
+            if code is None:
+                code = self._value_codes[field][key] = len(self._dictionaries[field])
+                self._dictionaries[field].append(value)
+            codes.append(code)
+        self.count += 1
+        for codes in self._fields.values():
+            if len(codes) < self.count:
+                codes.append(NO_VALUE)
+
+    def add_many(self, chunks: Iterable):
+        """Adds VectorizedChunk objects or {'text', 'embedding', 'metadata'} dicts."""
+        for chunk in chunks:
+            if isinstance(chunk, dict):
+                self.add(chunk['text'], chunk['embedding'], chunk.get('metadata', {}))
+            else:
+                self.add(chunk.text, chunk.embedding, chunk.metadata)
+
+    def close(self):
+        self._vectors.close()
+        self._texts.close()
+        fields = list(self._fields)
+        np.save(os.path.join(self.tmp_path, OFFSETS_FILE), np.frombuffer(self._offsets, dtype=np.int64))
+        codes = np.full((len(fields), self.count), NO_VALUE, dtype=np.int32)
+        for row, field in enumerate(fields):
+            codes[row] = np.frombuffer(self._fields[field], dtype=np.int32)
+        np.save(os.path.join(self.tmp_path, CODES_FILE), codes)
+        self._write_postings(self._postings.build())
+        with open(os.path.join(self.tmp_path, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump({
+                'format': INDEX_FORMAT,
+                'count': self.count,
+                'dimension': self.dimension or config.EMBEDDING_DIMENSION,
+                'normalized': True,
+                'embedding_model': self.embedding_model,
+                'fields': fields,
+                'dictionaries': [self._dictionaries[field] for field in fields],
+            }, f, ensure_ascii=False)
+
+        # Swap the new directory in; a previous index is removed only once the new one is in place
+        old_path = None
+        if os.path.exists(self.path):
+            old_path = self.path.rstrip('/\\') + '.old'
+            if os.path.exists(old_path):
+                shutil.rmtree(old_path)
+            os.replace(self.path, old_path)
+        os.replace(self.tmp_path, self.path)
+        if old_path:
+            shutil.rmtree(old_path)
+
+    def _write_postings(self, postings: Postings):
+        encoded = [term.encode('utf-8') for term in postings.terms]
+        term_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(term) for term in encoded], out=term_offsets[1:])
+        with open(os.path.join(self.tmp_path, TERMS_FILE), 'wb') as f:
+            f.write(b''.join(encoded))
+        np.save(os.path.join(self.tmp_path, TERM_OFFSETS_FILE), term_offsets)
+        np.save(os.path.join(self.tmp_path, POSTING_OFFSETS_FILE), postings.offsets)
+        np.save(os.path.join(self.tmp_path, POSTINGS_FILE), np.stack([postings.docs, postings.tfs]))
+        np.save(os.path.join(self.tmp_path, DOC_LENS_FILE), postings.doc_lens)
+
+def write_index(path: str, chunks: Iterable, dimension: Optional[int] = None,
+                embedding_model: Optional[str] = None) -> int:
+    """Writes chunks (see IndexWriter.add_many) as an index directory. Returns the chunk count."""
+    writer = IndexWriter(path, dimension, embedding_model)
+    writer.add_many(chunks)
+    writer.close()
+    return writer.count
+
+class IndexChunks(Sequence):
+    """Read-only sequence of {'text', 'metadata'} dicts over an index reader, built on access."""
+
+    def __init__(self, index):
+        self.index = index
+
+    def __len__(self) -> int:
+        return self.index.count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('chunk index out of range')
+        return {'text': self.index.text(i), 'metadata': self.index.metadata(i)}
+
+class MetadataColumns:
+    """
+    Chunk metadata encoded column by column: per field, a dictionary of its distinct values and
+    an int32 code per chunk (NO_VALUE where the chunk lacks the field).
+
+    Filters are evaluated once per distinct value and then as vectorized masks over the codes,
+    instead of comparing every chunk's metadata dict.
+    """
+
+    def __init__(self, fields: List[str], dictionaries: Dict[str, List[Any]], codes: np.ndarray):
+        self.fields = fields
+        self.dictionaries = dictionaries
+        self.codes = codes
+        self.count = codes.shape[1] if codes.ndim == 2 else 0
+        self._field_rows = {field: row for row, field in enumerate(fields)}
+
+    @classmethod
+    def encode(cls, metadatas: Sequence[Dict[str, Any]]) -> 'MetadataColumns':
+        fields: List[str] = []
+        dictionaries: Dict[str, List[Any]] = {}
+        value_codes: Dict[str, Dict[str, int]] = {}
+        rows: Dict[str, List[tuple]] = {}
+        for i, metadata in enumerate(metadatas):
+            for field, value in metadata.items():
+                if field not in dictionaries:
+                    fields.append(field)
+                    dictionaries[field] = []
+                    value_codes[field] = {}
+                    rows[field] = []
+                key = _value_key(value)
+                code = value_codes[field].get(key)
+                if code is None:
+                    code = value_codes[field][key] = len(dictionaries[field])
+                    dictionaries[field].append(value)
+                rows[field].append((i, code))
+        codes = np.full((len(fields), len(metadatas)), NO_VALUE, dtype=np.int32)
+        for row, field in enumerate(fields):
+            positions, field_codes = zip(*rows[field])
+            codes[row, list(positions)] = field_codes
+        return cls(fields, dictionaries, codes)
+
+    def column(self, field: str) -> Optional[np.ndarray]:
+        """The dictionary codes of a metadata field for all chunks (None if no chunk has it)."""
+        row = self._field_rows.get(field)
+        return None if row is None else self.codes[row]
+
+    def metadata(self, i: int) -> Dict[str, Any]:
+        metadata = {}
+        for row, field in enumerate(self.fields):
+            code = self.codes[row, i]
+            if code != NO_VALUE:
+                metadata[field] = self.dictionaries[field][code]
+        return metadata
+
+    def filter_mask(self, filters: Dict[str, Any]) -> np.ndarray:
+        """
+        Boolean mask of the chunks matching every filter: a list matches any of its values, any
+        other value must be equal, and empty filter values are ignored (HybridSearcher semantics).
+        """
+        mask = np.ones(self.count, dtype=bool)
+        for field, value in filters.items():
+            if not value:
+                continue
+            column = self.column(field)
+            if column is None:
+                mask[:] = False
+                break
+            if isinstance(value, list):
+                codes = [code for code, candidate in enumerate(self.dictionaries[field]) if candidate in value]
+            else:
+                codes = [code for code, candidate in enumerate(self.dictionaries[field]) if candidate == value]
+            mask &= np.isin(column, codes)
+        return mask
+
+class IndexReader:
+    """
+    Opens an index directory written by IndexWriter.
+
+    The vector matrix, texts, offsets and metadata codes are memory-mapped: opening costs the
+    same whatever the index size, and processes serving the same index share its pages.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, META_FILE), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('format') != INDEX_FORMAT:
+            raise ValueError(f'Unsupported index format: {meta.get("format")}')
+        self.count = meta['count']
+        self.dimension = meta['dimension']
+        # Embedding backend that produced the vectors (None for indexes written before it was recorded)
+        self.embedding_model: Optional[str] = meta.get('embedding_model')
+        self.fields: List[str] = meta['fields']
+        self.dictionaries: Dict[str, List[Any]] = dict(zip(self.fields, meta['dictionaries']))
+
+        if self.count:
+            self.vectors = np.memmap(os.path.join(path, VECTORS_FILE), dtype=np.float32, mode='r',
+                                     shape=(self.count, self.dimension))
+            if not meta.get('normalized'):
+                # Written before vectors were normalized on write: normalize once, in memory
+                norms = np.linalg.norm(self.vectors, axis=1, keepdims=True)
+                norms[norms == 0] = 1
+                self.vectors = (self.vectors / norms).astype(np.float32)
+        else:
+            self.vectors = np.zeros((0, self.dimension), dtype=np.float32)
+        self.offsets = np.load(os.path.join(path, OFFSETS_FILE), mmap_mode='r')
+        self.codes = np.load(os.path.join(path, CODES_FILE), mmap_mode='r')
+        self.columns = MetadataColumns(self.fields, self.dictionaries, self.codes)
+
+        self._texts_file = open(os.path.join(path, TEXTS_FILE), 'rb')
+        if os.fstat(self._texts_file.fileno()).st_size:
+            self._texts = mmap.mmap(self._texts_file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._texts = b''
+
+    def __len__(self) -> int:
+        return self.count
+
+    def text(self, i: int) -> str:
+        return self._texts[int(self.offsets[i]):int(self.offsets[i + 1])].decode('utf-8')
+
+    def iter_texts(self) -> Iterator[str]:
+        for i in range(self.count):
+            yield self.text(i)
+
+    def metadata(self, i: int) -> Dict[str, Any]:
+        return self.columns.metadata(i)
+
+    def column(self, field: str) -> Optional[np.ndarray]:
+        """The dictionary codes of a metadata field for all chunks (None if no chunk has it)."""
+        return self.columns.column(field)
+
+    def filter_mask(self, filters: Dict[str, Any]) -> np.ndarray:
+        return self.columns.filter_mask(filters)
+
+    def postings(self) -> Postings:
+        """BM25 postings, memory-mapped (built from the texts for indexes written without them)."""
+        if not os.path.exists(os.path.join(self.path, POSTINGS_FILE)):
+            return Postings.build(self.iter_texts())
+        with open(os.path.join(self.path, TERMS_FILE), 'rb') as f:
+            data = f.read()
+        term_offsets = np.load(os.path.join(self.path, TERM_OFFSETS_FILE)).tolist()
+        terms = [data[start:end].decode('utf-8') for start, end in zip(term_offsets, term_offsets[1:])]
+        postings = np.load(os.path.join(self.path, POSTINGS_FILE), mmap_mode='r')
+        return Postings(
+            terms,
+            np.load(os.path.join(self.path, POSTING_OFFSETS_FILE), mmap_mode='r'),
+            postings[0],
+            postings[1],
+            np.load(os.path.join(self.path, DOC_LENS_FILE), mmap_mode='r'),
+        )
+
+    def chunks(self) -> IndexChunks:
+        return IndexChunks(self)
+
+    def close(self):
+        if isinstance(self._texts, mmap.mmap):
+            self._texts.close()
+        self._texts_file.close()
+
+def _write_json_atomic(path: str, payload: Dict[str, Any]):
+    # A unique temp file per write: writers in several processes never share one
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=f'.{os.path.basename(path)}-')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+class SegmentedIndex:
+    """
+    Append-only local index made of immutable segments.
+
+    add() writes new chunks as one new segment, so ingesting a meeting costs time in proportion
+    to that meeting. With replace_field, chunks of older segments that share a value of that
+    field with the new chunks (e.g. the same 'source') are deleted in the same manifest update,
+    which makes re-indexing a document an upsert. Deletes are tombstones: sorted row numbers per
+    segment, applied by readers.
+
+    compact() rewrites segments into one, dropping deleted rows. After each add, once there are
+    more than max_segments segments, the smallest are merged on a background thread; the
+    manifest is swapped atomically, so readers keep a consistent snapshot throughout. A single
+    writing process is assumed.
+
+    The manifest records the embedding backend of its vectors (embedding_model); add() rejects
+    chunks embedded by another backend, since their scores would not be comparable.
+    """
+
+    def __init__(self, path: str = config.INDEX_PATH, max_segments: int = config.INDEX_MAX_SEGMENTS):
+        self.path = path
+        self.max_segments = max_segments
+        self._lock = threading.RLock()
+        self._compaction_lock = threading.Lock()
+        self._compaction: Optional[threading.Thread] = None
+        os.makedirs(os.path.join(path, SEGMENTS_DIR), exist_ok=True)
+        os.makedirs(os.path.join(path, TOMBSTONES_DIR), exist_ok=True)
+        with self._lock:
+            if not os.path.exists(self._manifest_path):
+                self._write_manifest({'format': INDEX_FORMAT, 'generation': 0, 'next_segment': 0, 'segments': []})
+                if is_index_dir(path):
+                    self._adopt_plain_index()
+
+    @property
+    def _manifest_path(self) -> str:
+        return os.path.join(self.path, MANIFEST_FILE)
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        with open(self._manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest: Dict[str, Any]):
+        _write_json_atomic(self._manifest_path, manifest)
+
+    def _segment_path(self, name: str) -> str:
+        return os.path.join(self.path, SEGMENTS_DIR, name)
+
+    def _reserve_segment_name(self) -> str:
+        with self._lock:
+            manifest = self._read_manifest()
+            name = f'seg-{manifest["next_segment"]:06d}'
+            manifest['next_segment'] += 1
+            self._write_manifest(manifest)
+            return name
+
+    def _adopt_plain_index(self):
+        # An unsegmented index directory (IndexWriter output) becomes the first segment
+        name = self._reserve_segment_name()
+        os.makedirs(self._segment_path(name))
+        for file_name in INDEX_FILES:
+            if os.path.exists(os.path.join(self.path, file_name)):
+                os.replace(os.path.join(self.path, file_name), os.path.join(self._segment_path(name), file_name))
+        reader = IndexReader(self._segment_path(name))
+        manifest = self._read_manifest()
+        manifest['embedding_model'] = reader.embedding_model
+        manifest['segments'].append({'name': name, 'count': reader.count, 'deleted': 0, 'tombstones': None})
+        self._write_manifest(manifest)
+        reader.close()
+
+    def segments(self) -> List[Dict[str, Any]]:
+        return self._read_manifest()['segments']
+
+    @property
+    def embedding_model(self) -> Optional[str]:
+        return self._read_manifest().get('embedding_model')
+
+    def _check_embedding_model(self, manifest: Dict[str, Any], embedding_model: str):
+        recorded = manifest.get('embedding_model')
+        if recorded and recorded != embedding_model:
+            raise ValueError(f'Index {self.path} holds {recorded} embeddings; '
+                             f'refusing to add {embedding_model} embeddings')
+
+    def add(self, chunks: Iterable, embedding_model: str, replace_field: Optional[str] = None) -> int:
+        """
+        Writes chunks (see IndexWriter.add_many) as a new segment and returns their number.
+        embedding_model names the backend that embedded them (EmbeddingGenerator.backend_name);
+        a ValueError is raised if the index holds another backend's vectors. With replace_field,
+        older chunks having one of the new chunks' values of that field are deleted.
+        """
+        with self._lock:
+            self._check_embedding_model(self._read_manifest(), embedding_model)
+        name = self._reserve_segment_name()
+        writer = IndexWriter(self._segment_path(name), embedding_model=embedding_model)
+        replaced = set()
+        for chunk in chunks:
+            metadata = chunk.get('metadata', {}) if isinstance(chunk, dict) else chunk.metadata
+            writer.add_many([chunk])
+            if replace_field and replace_field in metadata:
+                replaced.add(_value_key(metadata[replace_field]))
+        writer.close()
+
+        with self._lock:
+            manifest = self._read_manifest()
+            try:
+                self._check_embedding_model(manifest, embedding_model)
+            except ValueError:
+                shutil.rmtree(self._segment_path(name))
+                raise
+            manifest['embedding_model'] = embedding_model
+            obsolete = self._tombstone(manifest, replace_field, replaced) if replaced else []
+            if writer.count:
+                manifest['segments'].append({'name': name, 'count': writer.count, 'deleted': 0, 'tombstones': None})
+            self._write_manifest(manifest)
+            self._remove_files(obsolete)
+        if not writer.count:
+            shutil.rmtree(self._segment_path(name))
+
+        self.maybe_compact()
+        return writer.count
+
+    def delete_where(self, field: str, values: Iterable) -> int:
+        """Deletes the chunks whose metadata field has one of the given values. Returns how many."""
+        with self._lock:
+            manifest = self._read_manifest()
+            before = sum(segment['deleted'] for segment in manifest['segments'])
+            obsolete = self._tombstone(manifest, field, {_value_key(value) for value in values})
+            self._write_manifest(manifest)
+            self._remove_files(obsolete)
+            return sum(segment['deleted'] for segment in manifest['segments']) - before
+
+    def _load_tombstones(self, segment: Dict[str, Any]) -> np.ndarray:
+        if not segment.get('tombstones'):
+            return np.zeros(0, dtype=np.int32)
+        return np.load(os.path.join(self.path, TOMBSTONES_DIR, segment['tombstones']))
+
+    def _set_tombstones(self, manifest: Dict[str, Any], segment: Dict[str, Any], rows: np.ndarray) -> Optional[str]:
+        # Tombstone files are immutable too: each change writes a new one. Returns the replaced file.
+        manifest['generation'] += 1
+        file_name = f'{segment["name"]}-{manifest["generation"]}.npy'
+        np.save(os.path.join(self.path, TOMBSTONES_DIR, file_name), rows.astype(np.int32))
+        previous = segment.get('tombstones')
+        segment['tombstones'] = file_name
+        segment['deleted'] = int(len(rows))
+        return previous
+
+    def _tombstone(self, manifest: Dict[str, Any], field: str, value_keys: set) -> List[str]:
+        obsolete = []
+        for segment in manifest['segments']:
+            reader = IndexReader(self._segment_path(segment['name']))
+            try:
+                column = reader.column(field)
+                codes = [code for code, value in enumerate(reader.dictionaries.get(field, []))
+                         if _value_key(value) in value_keys]
+                if column is None or not codes:
+                    continue
+                deleted = self._load_tombstones(segment)
+                rows = np.union1d(deleted, np.flatnonzero(np.isin(column, codes)))
+            finally:
+                reader.close()
+            if len(rows) > len(deleted):
+                previous = self._set_tombstones(manifest, segment, rows)
+                if previous:
+                    obsolete.append(os.path.join(self.path, TOMBSTONES_DIR, previous))
+        return obsolete
+
+    def _remove_files(self, paths: Iterable[str]):
+        for path in paths:
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            elif os.path.exists(path):
+                os.remove(path)
+
+    def compact(self, names: Optional[Iterable[str]] = None) -> Optional[str]:
+        """
+        Merges the named segments (default: all) into one new segment without their deleted
+        rows. Deletes that land while the merge runs are carried over. Returns the new segment name.
+        """
+        with self._compaction_lock:
+            with self._lock:
+                manifest = self._read_manifest()
+                wanted = None if names is None else set(names)
+                merged = [segment for segment in manifest['segments'] if wanted is None or segment['name'] in wanted]
+                if not merged or (len(merged) == 1 and not merged[0]['deleted']):
+                    return None
+                snapshots = {segment['name']: self._load_tombstones(segment) for segment in merged}
+                embedding_model = manifest.get('embedding_model')
+            name = self._reserve_segment_name()
+
+            # New row number of every kept row, per merged segment
+            new_rows = {}
+            writer = IndexWriter(self._segment_path(name), embedding_model=embedding_model)
+            for segment in merged:
+                reader = IndexReader(self._segment_path(segment['name']))
+                keep = np.ones(reader.count, dtype=bool)
+                keep[snapshots[segment['name']]] = False
+                new_rows[segment['name']] = np.cumsum(keep) - 1 + writer.count
+                for row in np.flatnonzero(keep):
+                    writer.add(reader.text(row), reader.vectors[row], reader.metadata(row))
+                reader.close()
+            writer.close()
+
+            with self._lock:
+                manifest = self._read_manifest()
+                entry = {'name': name, 'count': writer.count, 'deleted': 0, 'tombstones': None}
+                late_deletes = []
+                obsolete = []
+                segments = []
+                for segment in manifest['segments']:
+                    if segment['name'] not in new_rows:
+                        segments.append(segment)
+                        continue
+                    late = np.setdiff1d(self._load_tombstones(segment), snapshots[segment['name']])
+                    late_deletes.append(new_rows[segment['name']][late])
+                    obsolete.append(self._segment_path(segment['name']))
+                    if segment.get('tombstones'):
+                        obsolete.append(os.path.join(self.path, TOMBSTONES_DIR, segment['tombstones']))
+                    # The merged segment takes the place of the first segment it replaces
+                    if not any(kept is entry for kept in segments):
+                        segments.append(entry)
+                manifest['segments'] = segments
+                late_deletes = np.concatenate(late_deletes)
+                if len(late_deletes):
+                    self._set_tombstones(manifest, entry, np.sort(late_deletes))
+                if not writer.count:
+                    manifest['segments'].remove(entry)
+                    obsolete.append(self._segment_path(name))
+                self._write_manifest(manifest)
+                self._remove_files(obsolete)
+            return name
+
+    def maybe_compact(self, background: bool = True):
+        """Once there are more than max_segments segments, merges the smallest down to max_segments // 2."""
+        segments = self.segments()
+        if len(segments) <= self.max_segments:
+            return
+        smallest = sorted(segments, key=lambda segment: segment['count'] - segment['deleted'])
+        names = [segment['name'] for segment in smallest[:len(segments) - self.max_segments // 2 + 1]]
+        if not background:
+            self.compact(names)
+            return
+        if self._compaction is not None and self._compaction.is_alive():
+            return
+        # Not a daemon: a pipeline exiting right after an add still lets the merge finish
+        self._compaction = threading.Thread(target=self.compact, args=(names,), name='index-compaction')
+        self._compaction.start()
+
+    def wait(self):
+        """Waits for a background compaction, if one is running."""
+        if self._compaction is not None:
+            self._compaction.join()
+
+class SegmentedIndexReader:
+    """
+    Read-only view of a SegmentedIndex snapshot (or of a plain index directory) as one index.
+
+    Rows are numbered across segments in manifest order, skipping deleted rows. Segments stay
+    memory-mapped; vector scores are computed segment by segment.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if os.path.exists(os.path.join(path, MANIFEST_FILE)):
+            with open(os.path.join(path, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            entries = manifest['segments']
+            self.embedding_model: Optional[str] = manifest.get('embedding_model')
+            self.segments = [IndexReader(os.path.join(path, SEGMENTS_DIR, entry['name'])) for entry in entries]
+            deleted = [
+                np.load(os.path.join(path, TOMBSTONES_DIR, entry['tombstones'])) if entry.get('tombstones') else None
+                for entry in entries
+            ]
+        else:
+            self.segments = [IndexReader(path)]
+            self.embedding_model = self.segments[0].embedding_model
+            deleted = [None]
+
+        self.dimension = self.segments[0].dimension if self.segments else config.EMBEDDING_DIMENSION
+        self.starts = np.zeros(len(self.segments) + 1, dtype=np.int64)
+        np.cumsum([segment.count for segment in self.segments], out=self.starts[1:])
+        live = np.ones(int(self.starts[-1]), dtype=bool)
+        for segment_start, rows in zip(self.starts, deleted):
+            if rows is not None:
+                live[segment_start + rows] = False
+        self.live = live
+        # Global row of each live row
+        self.rows = np.flatnonzero(live)
+        self.count = len(self.rows)
+        self._bm25: Optional[BM25Scorer] = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _locate(self, i: int):
+        row = int(self.rows[i])
+        segment = int(np.searchsorted(self.starts, row, side='right')) - 1
+        return self.segments[segment], row - int(self.starts[segment])
+
+    def text(self, i: int) -> str:
+        segment, row = self._locate(i)
+        return segment.text(row)
+
+    def metadata(self, i: int) -> Dict[str, Any]:
+        segment, row = self._locate(i)
+        return segment.metadata(row)
+
+    def iter_texts(self) -> Iterator[str]:
+        for segment, segment_start in zip(self.segments, self.starts):
+            for row in np.flatnonzero(self.live[segment_start:segment_start + segment.count]):
+                yield segment.text(row)
+
+    def chunks(self) -> IndexChunks:
+        return IndexChunks(self)
+
+    def unique_values(self, field: str) -> List[Any]:
+        """Values of a metadata field on live rows (values left only on deleted rows are skipped)."""
+        values = {}
+        for segment, segment_start in zip(self.segments, self.starts):
+            column = segment.column(field)
+            if column is None:
+                continue
+            dictionary = segment.dictionaries[field]
+            codes = np.unique(column[self.live[segment_start:segment_start + segment.count]])
+            for code in codes[codes != NO_VALUE].tolist():
+                values.setdefault(_value_key(dictionary[code]), dictionary[code])
+        return list(values.values())
+
+    def bm25_scores(self, query: List[str]) -> np.ndarray:
+        """
+        BM25 scores of every live row for a tokenized query (see brain.bm25). The collection
+        statistics are gathered from the segments' postings on first use.
+        """
+        if self._bm25 is None:
+            self._bm25 = BM25Scorer([segment.postings() for segment in self.segments], self.starts, self.live)
+        return self._bm25.get_scores(query)
+
+    def filter_mask(self, filters: Dict[str, Any]) -> np.ndarray:
+        """Boolean mask over live rows of those matching filters (see MetadataColumns.filter_mask)."""
+        masks = [segment.filter_mask(filters) for segment in self.segments]
+        mask = np.concatenate(masks) if masks else np.zeros(0, dtype=bool)
+        return mask if len(mask) == self.count else mask[self.rows]
+
+    def cosine_scores(self, query_vec: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Cosine similarity of every live row to query_vec (which must be unit-length), as float32.
+        Rows are stored unit-length, so this is one matrix-vector product per segment written
+        straight into the result: nothing of the corpus' size is allocated.
+
+        With rows (sorted live row numbers, e.g. those passing a filter), only those rows are
+        scored, in that order.
+        """
+        query_vec = np.asarray(query_vec, dtype=np.float32)
+        if rows is not None:
+            rows = self.rows[rows]
+            scores = np.empty(len(rows), dtype=np.float32)
+            bounds = np.searchsorted(rows, self.starts)
+            for segment, segment_start, lo, hi in zip(self.segments, self.starts, bounds, bounds[1:]):
+                if hi > lo:
+                    np.dot(segment.vectors[rows[lo:hi] - segment_start], query_vec, out=scores[lo:hi])
+            return scores
+        scores = np.empty(int(self.starts[-1]), dtype=np.float32)
+        for segment, segment_start in zip(self.segments, self.starts):
+            if segment.count:
+                np.dot(segment.vectors, query_vec, out=scores[segment_start:segment_start + segment.count])
+        return scores if len(scores) == self.count else scores[self.rows]
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+
+def open_index(path: str, retries: int = 3) -> SegmentedIndexReader:
+    """Opens a segmented or plain index directory, retrying if a compaction swaps segments meanwhile."""
+    for attempt in range(retries):
+        try:
+            return SegmentedIndexReader(path)
+        except FileNotFoundError:
+            if attempt == retries - 1:
+                raise
+
+def is_index(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, MANIFEST_FILE)) or is_index_dir(path)
+
+def convert_json_index(json_path: str, path: str, embedding_model: str = config.EMBEDDING_MODEL) -> int:
+    """
+    Adds the chunks of a legacy index.json (a list of {'text', 'embedding', 'metadata'}) to a
+    segmented index. The JSON file does not say which backend embedded it: pass embedding_model.
+    """
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return SegmentedIndex(path).add(data, embedding_model)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert a JSON index to the binary index format.')
+    parser.add_argument('json_index', nargs='?', default='brain/index.json', help='Legacy index.json')
+    parser.add_argument('output', nargs='?', default=config.INDEX_PATH, help='Segmented index directory to add the chunks to')
+    parser.add_argument('--embedding-model', default=config.EMBEDDING_MODEL,
+                        help="Backend that embedded the JSON index (e.g. text-embedding-004 or local-hash-768)")
+    args = parser.parse_args()
+
+    count = convert_json_index(args.json_index, args.output, args.embedding_model)
+    print(f'Converted {count} chunks from {args.json_index} to {args.output}.')
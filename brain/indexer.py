@@ -1,57 +1,140 @@
-from typing import List, Dict, Any
+from collections import deque
+from typing import Dict, Any, Iterator, List, Tuple
 import re
+from crawler import config
+from brain.chunks import ChunkStore
+
+# Unit boundaries from coarse to fine: paragraphs, lines, sentences, words. A span longer than
+# the chunk size is split at the next finer level until every unit fits.
+SPLIT_LEVELS = [
+    re.compile(r'\n[ \t\r\f\v]*\n\s*'),
+    re.compile(r'\n\s*'),
+    re.compile(r'(?<=[.!?;])\s+'),
+    re.compile(r'\s+'),
+]
+SENTENCE_LEVEL = 2
+
+SEGMENTATION_MODES = ('rule', 'spacy')
 
 class ChunkingStrategy:
-    def __init__(self, chunk_size: int = 1000, overlap: int = 100):
+    """
+    Splits documents into chunks of at most chunk_size characters.
+
+    Chunks are built from whole units (paragraphs, or lines, sentences and words when a
+    paragraph is too long) and each chunk starts with the trailing units of the previous one
+    that fit in `overlap` characters. Every chunk is a slice of the source text, returned with
+    its character offsets, and chunks are produced lazily so long documents never materialize
+    more than one chunk's worth of units.
+
+    Sentences are found with a punctuation regex ('rule' segmentation) or with spaCy's
+    sentencizer ('spacy'), which runs over windows of at most `window` characters.
+    """
+
+    def __init__(self, chunk_size: int = config.CHUNK_SIZE, overlap: int = config.CHUNK_OVERLAP,
+                 segmentation: str = config.SEGMENTATION_MODE, window: int = config.SEGMENT_WINDOW):
+        if segmentation not in SEGMENTATION_MODES:
+            raise ValueError(f'Unknown segmentation mode: {segmentation}')
         self.chunk_size = chunk_size
-        self.overlap = overlap
+        self.overlap = min(overlap, chunk_size // 2)
+        self.segmentation = segmentation
+        self.window = window
+
+    def iter_units(self, text: str, start: int = 0, end: int = None, level: int = 0) -> Iterator[Tuple[int, int]]:
+        """Yields (start, end) spans of whitespace-trimmed units, each at most chunk_size long."""
+        if end is None:
+            end = len(text)
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start >= end:
+            return
+
+        if end - start <= self.chunk_size:
+            yield start, end
+            return
+
+        if level == len(SPLIT_LEVELS):
+            # A single word longer than a chunk: cut it
+            for offset in range(start, end, self.chunk_size):
+                yield offset, min(offset + self.chunk_size, end)
+            return
+
+        if level == SENTENCE_LEVEL and self.segmentation == 'spacy':
+            pieces = self._sentences(text, start, end)
+        else:
+            pieces = self._split(text, start, end, level)
+        for piece_start, piece_end in pieces:
+            yield from self.iter_units(text, piece_start, piece_end, level + 1)
+
+    def _split(self, text: str, start: int, end: int, level: int) -> Iterator[Tuple[int, int]]:
+        piece_start = start
+        for match in SPLIT_LEVELS[level].finditer(text, start, end):
+            yield piece_start, match.start()
+            piece_start = match.end()
+        yield piece_start, end
 
-    def chunk_document(self, document: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def _sentences(self, text: str, start: int, end: int) -> Iterator[Tuple[int, int]]:
+        from refinery.nlp import load_sentencizer
+
+        nlp = load_sentencizer()
+        # One window per batch: only a single window's Doc is alive at a time
+        for doc, offset in nlp.pipe(self._windows(text, start, end), as_tuples=True, batch_size=1):
+            for sent in doc.sents:
+                yield offset + sent.start_char, offset + sent.end_char
+
+    def _windows(self, text: str, start: int, end: int) -> Iterator[Tuple[str, int]]:
+        # Cut windows after a sentence end or line break where possible, else at a space
+        while start < end:
+            stop = min(start + self.window, end)
+            if stop < end:
+                cut = max(text.rfind('. ', start, stop), text.rfind('\n', start, stop))
+                if cut <= start:
+                    cut = text.rfind(' ', start, stop)
+                if cut > start:
+                    stop = cut + 1
+            yield text[start:stop], start
+            start = stop
+
+    def iter_spans(self, text: str) -> Iterator[Tuple[int, int]]:
+        """Yields the (start, end) offsets of the chunks of text."""
+        current = deque()
+        for unit in self.iter_units(text):
+            if current and unit[1] - current[0][0] > self.chunk_size:
+                yield current[0][0], current[-1][1]
+                # Carry over the trailing units that fit in the overlap
+                carried = deque()
+                for previous in reversed(current):
+                    if current[-1][1] - previous[0] > self.overlap:
+                        break
+                    carried.appendleft(previous)
+                # ...as long as the next unit still fits after them
+                while carried and unit[1] - carried[0][0] > self.chunk_size:
+                    carried.popleft()
+                current = carried
+            current.append(unit)
+        if current:
+            yield current[0][0], current[-1][1]
+
+    def iter_chunks(self, document: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Yields {'text', 'metadata', 'start', 'end'} dicts; metadata is shared, not copied."""
+        text = document.get('content', '')
+        metadata = document.get('metadata', {})
+        for start, end in self.iter_spans(text):
+            yield {'text': text[start:end], 'metadata': metadata, 'start': start, 'end': end}
+
+    def chunk_document(self, document: Dict[str, Any]) -> ChunkStore:
         text = document.get('content', '')
         metadata = document.get('metadata', {})
-        
+        chunks = ChunkStore()
+
         if not text:
-            return []
-
-        chunks = []
-        
-        # 1. Split by paragraphs (double newline)
-        paragraphs = text.split('\n\n')
-        
-        # Fallback: If text is long but no double newlines, split by single newline
-        if len(paragraphs) == 1 and len(text) > self.chunk_size:
-            paragraphs = text.split('\n')
-        
-        current_chunk = ''
-        
-        for para in paragraphs:
-            para = para.strip()
-            if not para:
-                continue
-                
-            if len(current_chunk) + len(para) > self.chunk_size:
-                if current_chunk:
-                    chunks.append({
-                        'text': current_chunk.strip(),
-                        'metadata': metadata
-                    })
-                    current_chunk = para
-                else:
-                    chunks.append({
-                        'text': para,
-                        'metadata': metadata
-                    })
-                    current_chunk = ''
-            else:
-                if current_chunk:
-                    current_chunk += '\n\n' + para
-                else:
-                    current_chunk = para
-        
-        if current_chunk:
-            chunks.append({
-                'text': current_chunk.strip(),
-                'metadata': metadata
-            })
-            
+            return chunks
+
+        doc = chunks.add_document(metadata)
+        for start, end in self.iter_spans(text):
+            chunks.add(text[start:end], doc, start=start, end=end)
         return chunks
+
+    def chunk_texts(self, text: str) -> List[str]:
+        return [text[start:end] for start, end in self.iter_spans(text)]
@@ -1,28 +1,28 @@
 import os
 import sys
 import json
-from typing import List, Dict, Any
+from typing import Iterator, List, Dict, Any, Tuple
 
 # Add project root to sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from crawler import config
+from brain.chunks import ChunkStore
+from brain.embedding_cache import get_embedding_cache
+from brain.indexer import ChunkingStrategy
 from brain.vectorizer import EmbeddingGenerator, Indexer, VectorizedChunk
 
-def chunk_text_func(text: str, chunk_size: int = 1000, overlap: int = 100) -> List[str]:
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = start + chunk_size
-        chunk = text[start:end]
-        chunks.append(chunk)
-        start += chunk_size - overlap
-    return chunks
+def chunk_spans(text: str, chunk_size: int = config.CHUNK_SIZE, overlap: int = config.CHUNK_OVERLAP) -> Iterator[Tuple[int, int]]:
+    return ChunkingStrategy(chunk_size, overlap).iter_spans(text)
+
+def chunk_text_func(text: str, chunk_size: int = config.CHUNK_SIZE, overlap: int = config.CHUNK_OVERLAP) -> List[str]:
+    return [text[start:end] for start, end in chunk_spans(text, chunk_size, overlap)]
 
 def ingest():
     specs_dir = 'data/specs'
     files = [f for f in os.listdir(specs_dir) if f.endswith('.txt') and os.path.getsize(os.path.join(specs_dir, f)) > 1000]
     
-    all_chunks = []
+    all_chunks = ChunkStore(with_chunk_ids=True)
     
     for f in files:
         print(f'Processing {f}...')
@@ -30,26 +30,23 @@ def ingest():
         with open(os.path.join(specs_dir, f), 'r', encoding='utf-8') as file:
             text = file.read()
             
-        text_chunks = chunk_text_func(text)
-        for i, chunk_content in enumerate(text_chunks):
-            all_chunks.append({
-                'text': chunk_content,
-                'metadata': {
-                    'source': f'3GPP TS {spec_name}',
-                    'title': f'{spec_name} Technical Specification',
-                    'chunk_id': i
-                }
-            })
+        doc = all_chunks.add_document({
+            'source': f'3GPP TS {spec_name}',
+            'title': f'{spec_name} Technical Specification'
+        })
+        for start, end in chunk_spans(text):
+            all_chunks.add(text[start:end], doc, start=start, end=end)
             
     print(f'Generated {len(all_chunks)} chunks.')
     
     # Embed
-    gen = EmbeddingGenerator()
+    gen = EmbeddingGenerator(cache=get_embedding_cache())
     vectors = gen.generate_embeddings(all_chunks)
+    gen.close()
     
     # Index
     indexer = Indexer()
-    indexer.upload_vectors(vectors)
+    indexer.upload_vectors(vectors, gen.backend_name, replace_field='source')
     print('Ingestion complete.')
 
 if __name__ == '__main__':
@@ -2,11 +2,17 @@ import argparse
 import logging
 import json
 import hashlib
+import os
+import sys
 import time
 import apache_beam as beam
 from apache_beam.options.pipeline_options import PipelineOptions, GoogleCloudOptions, SetupOptions, WorkerOptions
 from apache_beam.io import fileio
 
+# Add project root to sys.path (workers get the project modules from setup.py instead)
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+
 # Configuration (Hardcoded for Dataflow simplicity or passed via args)
 PROJECT_ID = 'still-manifest-478014-c1'
 REGION = 'us-central1'
@@ -16,21 +22,20 @@ OUTPUT_PREFIX = f'gs://{BUCKET}/vector_search_staging/dataflow_output'
 
 class ProcessSpec(beam.DoFn):
     """
-    Reads a file, extracts metadata, and chunks the content using Spacy.
+    Reads a file, extracts metadata, and chunks the content with the shared ChunkingStrategy,
+    so Dataflow chunk boundaries match the local and cloud pipelines. The whole spec is
+    chunked; with 'spacy' segmentation the sentencizer runs over bounded windows of it.
     """
+    def __init__(self, segmentation='rule'):
+        super().__init__()
+        self.segmentation = segmentation
+
     def setup(self):
-        import spacy
-        # Fallback if model not found, though requirements.txt should install it
-        try:
-            self.nlp = spacy.load("en_core_web_sm")
-        except OSError:
-            from spacy.cli import download
-            download("en_core_web_sm")
-            self.nlp = spacy.load("en_core_web_sm")
+        # Installed on workers from the project's setup.py (see run())
+        from brain.indexer import ChunkingStrategy
+        self.chunker = ChunkingStrategy(segmentation=self.segmentation)
 
     def process(self, readable_file):
-        import re
-        
         path = readable_file.metadata.path
         # file name like "38.211.txt"
         filename = path.split('/')[-1]
@@ -49,33 +54,9 @@ class ProcessSpec(beam.DoFn):
             'type': 'Technical Specification'
         }
 
-        doc = self.nlp(content[:1000000]) # Limit to 1MB per doc to avoid OOM in this simple version
-        
-        # Semantic Chunking (Simplistic for Dataflow stability)
-        # Groups sentences into chunks ~500 chars
-        current_chunk = []
-        current_length = 0
-        
-        for sent in doc.sents:
-            sent_text = sent.text.strip()
-            if not sent_text:
-                continue
-                
-            current_chunk.append(sent_text)
-            current_length += len(sent_text)
-            
-            if current_length >= 500:
-                chunk_text = " ".join(current_chunk)
-                yield {
-                    'text': chunk_text,
-                    'metadata': metadata
-                }
-                current_chunk = []
-                current_length = 0
-        
-        if current_chunk:
+        for chunk in self.chunker.iter_chunks({'content': content, 'metadata': metadata}):
             yield {
-                'text': " ".join(current_chunk),
+                'text': chunk['text'],
                 'metadata': metadata
             }
 
@@ -127,10 +108,16 @@ class GenerateEmbeddings(beam.DoFn):
 
 def run(argv=None):
     parser = argparse.ArgumentParser()
+    parser.add_argument('--segmentation', choices=['rule', 'spacy'], default='rule',
+                        help="Sentence segmentation: punctuation rules or spaCy's sentencizer")
     known_args, pipeline_args = parser.parse_known_args(argv)
 
     pipeline_options = PipelineOptions(pipeline_args)
-    pipeline_options.view_as(SetupOptions).save_main_session = True
+    setup_options = pipeline_options.view_as(SetupOptions)
+    setup_options.save_main_session = True
+    # Ship brain, crawler and refinery to the workers, which import the shared chunker
+    if not setup_options.setup_file:
+        setup_options.setup_file = os.path.join(PROJECT_ROOT, 'setup.py')
     
     # Vertex AI Quota Safety: Limit workers
     worker_options = pipeline_options.view_as(WorkerOptions)
@@ -141,7 +128,7 @@ def run(argv=None):
             p
             | 'MatchFiles' >> fileio.MatchFiles(INPUT_PREFIX)
             | 'ReadFiles' >> fileio.ReadMatches()
-            | 'ChunkSpecs' >> beam.ParDo(ProcessSpec())
+            | 'ChunkSpecs' >> beam.ParDo(ProcessSpec(known_args.segmentation))
             | 'BatchForEmbedding' >> beam.BatchElements(min_batch_size=5, max_batch_size=20)
             | 'EmbedChunks' >> beam.ParDo(GenerateEmbeddings())
             | 'WriteJSONL' >> beam.io.WriteToText(OUTPUT_PREFIX, file_name_suffix='.json')
@@ -10,15 +10,20 @@ import datetime
 # Add project root to sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from crawler import config
+from brain.bm25 import tokenize
+from brain.index_store import MetadataColumns, is_index, open_index
 from brain.vectorizer import EmbeddingGenerator
 
 class HybridSearcher:
-    def __init__(self, index_file: str = 'brain/index.json'):
+    def __init__(self, index_file: str = config.INDEX_PATH):
         self.index_file = index_file
-        self.bm25 = None
+        self.index = None # SegmentedIndexReader when loaded from an index directory
+        self.bm25 = None # BM25Okapi of a legacy JSON index
         self.chunks = []
-        self.corpus = []
         self.vectors = [] # Numpy array of embeddings
+        self.columns = None # MetadataColumns of the chunks (legacy JSON index)
+        self.vector_search = True # False when queries cannot be embedded in the index's space
         self.embedder = EmbeddingGenerator() # For query embedding
 
         self._load_index()
@@ -28,6 +33,9 @@ class HybridSearcher:
             f.write(f'{datetime.datetime.now()}: {msg}\n')
 
     def _load_index(self):
+        if is_index(self.index_file):
+            self._load_index_dir()
+            return
         if not os.path.exists(self.index_file):
             print(f'Warning: Index file {self.index_file} not found.')
             return
@@ -36,16 +44,37 @@ class HybridSearcher:
         with open(self.index_file, 'r', encoding='utf-8') as f:
             data = json.load(f)
         self.chunks = data
-        self.corpus = [chunk['text'].lower().split(' ') for chunk in data]
-        self.bm25 = BM25Okapi(self.corpus)
-        # Load vectors into numpy array
+        self.bm25 = BM25Okapi([tokenize(chunk['text']) for chunk in data])
+        # Encode metadata once so filters are evaluated as vectorized masks
+        self.columns = MetadataColumns.encode([chunk.get('metadata', {}) for chunk in data])
+        # Load vectors into a float32 array, normalized once so scoring is a single dot product
         embeddings = [chunk['embedding'] for chunk in data]
         if embeddings:
-            self.vectors = np.array(embeddings)
+            self.vectors = np.array(embeddings, dtype=np.float32)
+            norm_docs = np.linalg.norm(self.vectors, axis=1, keepdims=True)
+            norm_docs[norm_docs == 0] = 1
+            self.vectors /= norm_docs
         else:
             self.vectors = np.array([])
         print(f'Loaded {len(self.chunks)} chunks.')
 
+    def _load_index_dir(self):
+        print(f'Loading index from {self.index_file}...')
+        self.index = open_index(self.index_file)
+        # Queries must be embedded in the same space as the indexed vectors
+        recorded = self.index.embedding_model
+        if recorded and recorded != self.embedder.backend_name:
+            message = (f'Index {self.index_file} holds {recorded} embeddings, '
+                       f'but queries would be embedded with {self.embedder.backend_name}')
+            if config.EMBEDDING_BACKEND != 'auto':
+                raise ValueError(message)
+            # 'auto' fell back to another backend (e.g. Vertex AI is down): search keywords only
+            print(f'Warning: {message}. Vector search is disabled; using BM25 and filters only.')
+            self.vector_search = False
+        # BM25 scores come from the index's memory-mapped postings: nothing is tokenized here
+        self.chunks = self.index.chunks()
+        print(f'Loaded {len(self.chunks)} chunks.')
+
     def _extract_phrases(self, query: str) -> List[str]:
         # Extracts quoted phrases from the query and normalizes them.
         return re.findall(r'"(.+?)"', query)
@@ -62,107 +91,107 @@ class HybridSearcher:
             print('Index is empty.')
             return []
 
-        # 1. Keyword Search (BM25)
-        tokenized_query = query.lower().split(' ')
-        bm25_scores = self.bm25.get_scores(tokenized_query)
-        # Normalize BM25 scores (0-1)
+        # 1. Candidate rows: metadata filters as a mask over the encoded columns, then
+        # content constraints (must-have terms) checked on the survivors only
+        candidates = None # None means every row
+        if filters:
+            candidates = np.flatnonzero(self._filter_mask(filters))
+        if must_have_terms:
+            # Pre-compute lower case terms
+            terms_lower = [t.lower() for t in must_have_terms]
+            rows = range(len(self.chunks)) if candidates is None else candidates
+            candidates = np.array([
+                i for i in rows
+                if any(term in self._text(i).lower() for term in terms_lower)
+            ], dtype=np.intp)
+        if candidates is not None and not len(candidates):
+            return []
+
+        # 2. Keyword Search (BM25)
+        tokenized_query = tokenize(query)
+        if self.index is not None:
+            bm25_scores = self.index.bm25_scores(tokenized_query)
+        else:
+            bm25_scores = self.bm25.get_scores(tokenized_query)
+        # Normalize BM25 scores (0-1) by the whole corpus' maximum, so filters and
+        # must-have terms only mask results and never rescale them
         if bm25_scores.max() > 0:
             bm25_scores = bm25_scores / bm25_scores.max()
+        if candidates is not None:
+            bm25_scores = bm25_scores[candidates]
 
-        # 2. Vector Search
+        # 3. Vector Search
         # Embed query
-        query_vectors = self.embedder.generate_embeddings([{'text': query, 'metadata': {}}])
+        query_vectors = self.embedder.generate_embeddings([{'text': query, 'metadata': {}}]) if self.vector_search else []
         if not query_vectors:
-            print('Failed to embed query.')
-            vector_scores = np.zeros(len(self.chunks))
+            if self.vector_search:
+                print('Failed to embed query.')
+            vector_scores = np.zeros(len(bm25_scores))
         else:
             query_vec = np.array(query_vectors[0].embedding)
             # Normalize query
             norm_q = np.linalg.norm(query_vec)
             if norm_q > 0:
                 query_vec = query_vec / norm_q
-            # Normalize doc vectors
-            norm_docs = np.linalg.norm(self.vectors, axis=1)
-            norm_docs[norm_docs == 0] = 1
-            normalized_vectors = self.vectors / norm_docs[:, np.newaxis]
-            vector_scores = np.dot(normalized_vectors, query_vec)
-            vector_scores = np.clip(vector_scores, 0, 1)
-
-        # 3. Combine scores
+            if self.index is not None:
+                vector_scores = self.index.cosine_scores(query_vec, rows=candidates)
+            else:
+                # Doc vectors are unit-length float32 (normalized at load)
+                vectors = self.vectors if candidates is None else self.vectors[candidates]
+                vector_scores = np.dot(vectors, query_vec.astype(np.float32))
+            np.clip(vector_scores, 0, 1, out=vector_scores)
+
+        # 4. Combine scores
         hybrid_scores = (1 - alpha) * bm25_scores + alpha * vector_scores
-        # 4. Apply Filters (Metadata)
-        if filters:
-            for i, chunk in enumerate(self.chunks):
-                metadata = chunk.get('metadata', {})
-                match = True
-                for key, value in filters.items():
-                    if not value:
-                        continue
-                    if key not in metadata:
-                        match = False
-                        break
-                    meta_val = metadata[key]
-                    if isinstance(value, list):
-                        if meta_val not in value:
-                            match = False
-                            break
-                    else:
-                        if meta_val != value:
-                            match = False
-                            break
-                if not match:
-                    hybrid_scores[i] = -1.0 # Exclude
-
-        # 5. Apply Content Constraints (Must-Have Terms)
-        if must_have_terms:
-            # Pre-compute lower case terms
-            terms_lower = [t.lower() for t in must_have_terms]
-            for i, chunk in enumerate(self.chunks):
-                # Skip if already excluded
-                if hybrid_scores[i] < 0:
-                    continue
-                text_lower = chunk['text'].lower()
-                has_term = False
-                for term in terms_lower:
-                    if term in text_lower:
-                        has_term = True
-                        break
-                if not has_term:
-                    hybrid_scores[i] = -1.0 # Exclude
-
-        # 6. Phrase Boosting
+
+        # 5. Phrase Boosting
         phrases = self._extract_phrases(query)
         if phrases:
-            phrase_boost_scores = np.zeros(len(self.chunks))
+            phrase_boost_scores = np.zeros(len(hybrid_scores))
             boost_count = 0
-            for i, chunk in enumerate(self.chunks):
-                # Skip if excluded
-                if hybrid_scores[i] < 0:
-                    continue
-                text_lower = chunk['text'].lower()
+            rows = range(len(self.chunks)) if candidates is None else candidates
+            for j, i in enumerate(rows):
+                text_lower = self._text(i).lower()
                 for phrase in phrases:
                     if phrase.lower() in text_lower:
-                        phrase_boost_scores[i] += 1.0 # Significant boost
+                        phrase_boost_scores[j] += 1.0 # Significant boost
                         boost_count += 1
                         self._log(f'Boosted chunk {i} for phrase "{phrase}"')
             self._log(f'Total chunks boosted: {boost_count}')
             hybrid_scores += phrase_boost_scores
 
-        # Get top K
-        top_indices = np.argsort(hybrid_scores)[::-1][:top_k]
+        # Get top K: partial selection, then sort only the selected scores
+        if top_k < len(hybrid_scores):
+            top_indices = np.argpartition(-hybrid_scores, top_k - 1)[:top_k]
+        else:
+            top_indices = np.arange(len(hybrid_scores))
+        top_indices = top_indices[np.argsort(-hybrid_scores[top_indices], kind='stable')]
         results = []
-        for idx in top_indices:
-            if hybrid_scores[idx] > -0.5: # Threshold to filter excluded
-                results.append({
-                    'chunk': self.chunks[idx],
-                    'score': float(hybrid_scores[idx]),
-                    'bm25_score': float(bm25_scores[idx]),
-                    'vector_score': float(vector_scores[idx])
-                })
+        for j in top_indices:
+            idx = j if candidates is None else candidates[j]
+            results.append({
+                'chunk': self.chunks[idx],
+                'score': float(hybrid_scores[j]),
+                'bm25_score': float(bm25_scores[j]),
+                'vector_score': float(vector_scores[j])
+            })
         return results
 
+    def _text(self, i: int) -> str:
+        if self.index is not None:
+            return self.index.text(i)
+        return self.chunks[i]['text']
+
+    def _filter_mask(self, filters: Dict[str, Any]) -> np.ndarray:
+        # Boolean mask of the rows matching all metadata filters
+        if self.index is not None:
+            return self.index.filter_mask(filters)
+        return self.columns.filter_mask(filters)
+
     def get_unique_metadata_values(self, field: str) -> List[str]:
         # Returns a sorted list of unique values for a given metadata field.
+        if self.index is not None:
+            return sorted(value for value in self.index.unique_values(field) if value)
         values = set()
         for chunk in self.chunks:
             val = chunk.get('metadata', {}).get(field)
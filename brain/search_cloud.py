@@ -2,6 +2,7 @@ import numpy as np
 import re
 from typing import List, Dict, Any
 from google.cloud import aiplatform_v1
+from brain.embeddings import get_embedding_backend
 from brain.vectorizer import EmbeddingGenerator
 from brain.docstore import DocStore
 from crawler import config
@@ -9,7 +10,8 @@ from crawler import config
 class CloudSearcher:
     def __init__(self):
         print('Initializing Cloud Searcher (Gapic)...')
-        self.embedder = EmbeddingGenerator()
+        # Queries must be embedded in the Vector Search index's (Vertex) space
+        self.embedder = EmbeddingGenerator(backend=get_embedding_backend('vertex'))
         self.docstore = DocStore()
         self.client = None
         
@@ -1,9 +1,16 @@
+import random
+import threading
 import time
-from typing import List, Optional, Dict, Any
-from vertexai.language_models import TextEmbeddingModel, TextEmbeddingInput
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Dict, Any
 from dataclasses import dataclass, asdict
 import os
 import json
+from crawler import config
+from crawler.ratelimit import TokenBucket
+from brain.embedding_cache import EmbeddingCache, text_key
+from brain.embeddings import EmbeddingBackend, get_embedding_backend
+from brain.index_store import SegmentedIndex
 
 @dataclass
 class VectorizedChunk:
@@ -12,65 +19,191 @@ class VectorizedChunk:
     metadata: Dict[str, Any]
 
 class EmbeddingGenerator:
-    def __init__(self, model_name: str = 'text-embedding-004'):
+    """
+    Embeds chunks with an EmbeddingBackend (by default the configured one, see
+    brain.embeddings.get_embedding_backend).
+
+    Requests to a remote backend run on a thread pool under a shared token bucket (requests_per_second). The batch
+    size adapts: it doubles after each successful request, up to max_batch_size, and halves
+    after a failure. Failed requests are retried with jittered exponential backoff; a request
+    rejected as invalid (HTTP 400, e.g. too many tokens) is split in two instead. Chunks that
+    still cannot be embedded are collected in failed_chunks rather than dropped silently.
+    """
+
+    def __init__(self, model_name: str = config.EMBEDDING_MODEL, cache: Optional[EmbeddingCache] = None,
+                 backend: Optional[EmbeddingBackend] = None,
+                 concurrency: int = config.EMBEDDING_CONCURRENCY,
+                 requests_per_second: float = config.EMBEDDING_REQUESTS_PER_SECOND,
+                 max_batch_size: int = config.EMBEDDING_MAX_BATCH_SIZE):
         self.model_name = model_name
-        self.model = None
+        self.backend = backend
+        self.cache = cache
+        self.concurrency = max(1, concurrency)
+        self.max_batch_size = max_batch_size
+        self.batch_size = min(config.EMBEDDING_INITIAL_BATCH_SIZE, max_batch_size)
+        self.rate_limiter = TokenBucket(requests_per_second)
+        self.failed_chunks: List[Dict[str, Any]] = []
+        self._executor = None
+        self._lock = threading.Lock()
 
-    def _load_model(self):
-        if not self.model:
-            try:
-                self.model = TextEmbeddingModel.from_pretrained(self.model_name)
-            except Exception as e:
-                print(f'Error loading model {self.model_name}: {e}')
-                pass
+    def _load_backend(self) -> EmbeddingBackend:
+        if self.backend is None:
+            self.backend = get_embedding_backend(model_name=self.model_name)
+        return self.backend
 
-    def generate_embeddings(self, chunks: List[Dict[str, Any]], batch_size: int = 5) -> List[VectorizedChunk]:
-        self._load_model()
-        vectorized_chunks = []
-        texts = [chunk['text'] for chunk in chunks]
-        
-        if not self.model:
-            print('Warning: Model not loaded. Using mock embeddings.')
-            for chunk in chunks:
-                vectorized_chunks.append(VectorizedChunk(
-                    text=chunk['text'],
-                    embedding=[0.1] * 768,
-                    metadata=chunk['metadata']
-                ))
-            return vectorized_chunks
-
-        for i in range(0, len(texts), batch_size):
-            batch_texts = texts[i : i + batch_size]
-            batch_chunks = chunks[i : i + batch_size]
-            inputs = [TextEmbeddingInput(text, 'RETRIEVAL_DOCUMENT') for text in batch_texts]
+    @property
+    def backend_name(self) -> str:
+        """Name of the embedding space (loads the backend); indexes record it to reject mixed vectors."""
+        return self._load_backend().name
+
+    def generate_embeddings(self, chunks: Iterable[Dict[str, Any]], batch_size: Optional[int] = None) -> List[VectorizedChunk]:
+        return list(self.iter_embeddings(chunks, batch_size))
+
+    def iter_embeddings(self, chunks: Iterable[Dict[str, Any]], batch_size: Optional[int] = None) -> Iterator[VectorizedChunk]:
+        """
+        Embeds chunks lazily and in input order, so a chunk generator (ChunkingStrategy.iter_chunks)
+        is consumed a window of requests at a time. With a cache, only chunks whose text has not
+        been embedded by this backend before are sent to it. batch_size, if given, sets the
+        starting batch size.
+        """
+        if batch_size:
+            self.batch_size = min(batch_size, self.max_batch_size)
+        window_size = self.concurrency * self.max_batch_size
+        window = []
+        for chunk in chunks:
+            window.append(chunk)
+            if len(window) == window_size:
+                yield from self._embed_window(window)
+                window = []
+        if window:
+            yield from self._embed_window(window)
+
+    def _embed_window(self, window: List[Dict[str, Any]]) -> List[VectorizedChunk]:
+        backend = self._load_backend()
+        texts = [chunk['text'] for chunk in window]
+        vectors = [None] * len(window)
+        if self.cache is not None:
+            keys = [text_key(text) for text in texts]
+            cached = self.cache.get_many(backend.name, keys)
+            vectors = [cached.get(key) for key in keys]
+
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            if backend.remote:
+                executor = self._get_executor()
+                requests = [
+                    (group, executor.submit(self._embed_with_retries, [texts[i] for i in group]))
+                    for group in self._plan_batches(missing, texts)
+                ]
+                results = [(group, future.result()) for group, future in requests]
+            else:
+                results = [(missing, backend.embed([texts[i] for i in missing]))]
+
+            embedded = []
+            for group, group_vectors in results:
+                for i, vector in zip(group, group_vectors):
+                    if vector is None:
+                        self.failed_chunks.append(window[i])
+                    else:
+                        vectors[i] = vector
+                        embedded.append(i)
+            if self.cache is not None and embedded:
+                self.cache.put_many(backend.name, [(keys[i], vectors[i]) for i in embedded])
+
+        return [
+            VectorizedChunk(text=chunk['text'], embedding=vector, metadata=chunk['metadata'])
+            for chunk, vector in zip(window, vectors) if vector is not None
+        ]
+
+    def _plan_batches(self, indices: List[int], texts: List[str]) -> List[List[int]]:
+        # Batches of at most batch_size chunks and EMBEDDING_MAX_BATCH_CHARS characters
+        batches = []
+        current = []
+        current_chars = 0
+        for i in indices:
+            size = len(texts[i])
+            if current and (len(current) >= self.batch_size or current_chars + size > config.EMBEDDING_MAX_BATCH_CHARS):
+                batches.append(current)
+                current = []
+                current_chars = 0
+            current.append(i)
+            current_chars += size
+        if current:
+            batches.append(current)
+        return batches
+
+    def _embed_with_retries(self, texts: List[str]) -> List[Optional[List[float]]]:
+        for attempt in range(config.EMBEDDING_RETRIES):
+            self.rate_limiter.acquire()
             try:
-                batch_embeddings = self.model.get_embeddings(inputs)
-                for j, embedding in enumerate(batch_embeddings):
-                    vectorized_chunks.append(VectorizedChunk(
-                        text=batch_chunks[j]['text'],
-                        embedding=embedding.values,
-                        metadata=batch_chunks[j]['metadata']
-                    ))
-                time.sleep(0.1) 
+                embeddings = self.backend.embed(texts)
             except Exception as e:
-                print(f'Error generating embeddings for batch {i}: {e}')
-                continue
-        return vectorized_chunks
+                self._adapt(success=False)
+                if getattr(e, 'code', None) == 400 and len(texts) > 1:
+                    # Invalid request: retrying it as is cannot help, but its halves may pass
+                    middle = len(texts) // 2
+                    return self._embed_with_retries(texts[:middle]) + self._embed_with_retries(texts[middle:])
+                if attempt == config.EMBEDDING_RETRIES - 1 or getattr(e, 'code', None) == 400:
+                    print(f'Error generating embeddings for {len(texts)} chunks: {e}')
+                    return [None] * len(texts)
+                time.sleep(2 ** attempt + random.random())
+            else:
+                self._adapt(success=True)
+                return embeddings
+        return [None] * len(texts)
+
+    def _adapt(self, success: bool):
+        with self._lock:
+            if success:
+                self.batch_size = min(self.max_batch_size, self.batch_size * 2)
+            else:
+                self.batch_size = max(1, self.batch_size // 2)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        return self._executor
+
+    def close(self):
+        """Stops the request threads and closes the embedding cache, if any (pushing new vectors to its mirror)."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self.failed_chunks:
+            print(f'Warning: {len(self.failed_chunks)} chunks could not be embedded (see failed_chunks).')
+        if self.cache is not None:
+            print(f'Embedding cache: {self.cache.hits} hits, {self.cache.misses} misses.')
+            self.cache.close()
+            self.cache = None
 
 class Indexer:
-    def __init__(self, index_file: str = 'brain/index.json'):
+    def __init__(self, index_file: str = config.INDEX_PATH):
         self.index_file = index_file
         
-    def upload_vectors(self, vectorized_chunks: List[VectorizedChunk]):
-        print(f'Saving {len(vectorized_chunks)} vectors to {self.index_file}...')
-        data = []
-        for chunk in vectorized_chunks:
-            data.append({
-                'text': chunk.text,
-                'embedding': chunk.embedding,
-                'metadata': chunk.metadata
-            })
-        os.makedirs(os.path.dirname(self.index_file), exist_ok=True)
-        with open(self.index_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        print('Index saved successfully.')
+    def upload_vectors(self, vectorized_chunks: Iterable[VectorizedChunk], embedding_model: str,
+                       replace_field: Optional[str] = None):
+        """
+        Adds chunks to the segmented index at index_file. With replace_field, older chunks that
+        share a value of that field with the new chunks are deleted: the spec pipelines pass
+        'source' (the spec), while TDoc sources are companies and must not be replaced.
+        embedding_model names the backend that produced the vectors
+        (EmbeddingGenerator.backend_name); the index rejects vectors of another backend. A path ending in .json is rewritten as a legacy JSON index
+        instead (which records no backend).
+        """
+        print(f'Saving vectors to {self.index_file}...')
+        if self.index_file.endswith('.json'):
+            # Legacy JSON index
+            data = []
+            for chunk in vectorized_chunks:
+                data.append({
+                    'text': chunk.text,
+                    'embedding': chunk.embedding,
+                    'metadata': chunk.metadata
+                })
+            os.makedirs(os.path.dirname(self.index_file), exist_ok=True)
+            with open(self.index_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            count = len(data)
+        else:
+            count = SegmentedIndex(self.index_file).add(vectorized_chunks, embedding_model, replace_field=replace_field)
+        print(f'Index saved successfully ({count} vectors).')
@@ -1,12 +1,14 @@
+import argparse
 import asyncio
+import hashlib
 import os
 import sys
-import re
 import json
 import requests
+import shutil
+import tempfile
 import zipfile
-import io
-import docx
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 # Add project root to sys.path
@@ -15,151 +17,244 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 from crawler import config
-from google.cloud import storage
+from crawler.manifest import CrawlManifest, parse_spec_version
+from refinery.docx_stream import iter_body_paragraphs
+from brain.blobstore import ContentAddressedStore, get_blob_store
+
+# Full Target List
+SPECS_TO_CRAWL = [
+    '38.211', '38.212', '38.213', '38.214',
+    '38.300', '38.321', '38.331',
+    '38.401', '38.413', '38.901'
+]
+
+BASE_FTP_PATH = '/Specs/archive/38_series'
+BASE_URL = config.FTP_HTTP_BASE_URL
 
 class ThreeGPPCrawler:
-    def __init__(self):
-        self.storage_client = None
-        self.bucket = None
-        self.bucket_name = config.GCS_BUCKET_NAME
+    def __init__(self, concurrency: int = config.CRAWL_CONCURRENCY):
+        self.concurrency = max(1, concurrency)
+        self.store = None
+        self.artifacts = None
+        self.manifest = CrawlManifest(config.CRAWL_MANIFEST_PATH, config.CRAWL_MANIFEST_BLOB)
         try:
-            self.storage_client = storage.Client(project=config.PROJECT_ID)
-            self.bucket = self.storage_client.bucket(self.bucket_name)
-            print(f'Initialized GCS bucket: {self.bucket_name} in project {config.PROJECT_ID}')
+            self.store = get_blob_store()
+            self.artifacts = ContentAddressedStore(self.store)
+            print(f'Initialized {config.STORAGE_BACKEND} storage: {self.store.uri("")}')
         except Exception as e:
-            print(f'Warning: Failed to initialize GCS client: {e}')
+            print(f'Warning: Failed to initialize storage backend: {e}')
 
     def download_directory(self, *args):
         # Adapter method for pipeline compatibility
         print('Starting Cloud Crawler...')
         asyncio.run(self.run())
 
-    def upload_blob(self, source_data, destination_blob_name, content_type='application/octet-stream'):
-        if not self.bucket:
-            print('Skipping upload (No GCS Bucket)')
-            return
+    def upload_blob(self, source_data, destination_blob_name, content_type='application/octet-stream') -> bool:
+        """Returns True once the blob is stored; False if there is no storage backend or the upload failed."""
+        if not self.store:
+            print('Skipping upload (No storage backend)')
+            return False
 
-        blob = self.bucket.blob(destination_blob_name)
-        
         try:
-            if isinstance(source_data, str):
-                blob.upload_from_string(source_data, content_type=content_type)
+            self.store.put(destination_blob_name, source_data, content_type)
+            print(f'Uploaded to {self.store.uri(destination_blob_name)}')
+            return True
+        except Exception as e:
+            print(f'Failed to upload {destination_blob_name}: {e}')
+            return False
+
+    def upload_artifact(self, source_data, destination_blob_name, content_type='application/octet-stream', digest=None, by_content=True) -> bool:
+        """
+        Uploads through the content hash index, skipping bytes that are already stored.
+        by_content=True stores raw artifacts under their hash; False keeps destination_blob_name as the key.
+        Returns True once the bytes are stored (uploaded now or before); False if there is no
+        storage backend or the upload failed.
+        """
+        if not self.artifacts:
+            print('Skipping upload (No storage backend)')
+            return False
+
+        try:
+            if by_content:
+                digest, uploaded = self.artifacts.put(destination_blob_name, source_data, content_type, digest)
+                stored_name = self.artifacts.object_name(digest)
             else:
-                if hasattr(source_data, 'seek'):
-                    source_data.seek(0)
-                blob.upload_from_file(source_data, content_type=content_type)
-            
-            print(f'Uploaded to gs://{self.bucket_name}/{destination_blob_name}')
+                digest, uploaded = self.artifacts.put_if_changed(destination_blob_name, source_data, content_type, digest)
+                stored_name = destination_blob_name
+
+            if uploaded:
+                print(f'Uploaded {destination_blob_name} to {self.store.uri(stored_name)}')
+            else:
+                print(f'{destination_blob_name} unchanged (sha256 {digest[:12]}). Skipping upload.')
+            return True
         except Exception as e:
             print(f'Failed to upload {destination_blob_name}: {e}')
+            return False
 
     def blob_exists(self, blob_name):
-        if not self.bucket: return False
-        blob = self.bucket.blob(blob_name)
-        return blob.exists()
+        if not self.store: return False
+        return self.store.exists(blob_name)
 
-    async def run(self):
+    async def run(self, concurrency: Optional[int] = None):
         server_parameters = StdioServerParameters(
             command=sys.executable,
             args=['-m', 'mcp_3gpp_ftp.server'],
             env=os.environ.copy()
         )
 
+        self.manifest.load(self.store)
+        if self.artifacts:
+            self.artifacts.load()
+
         async with stdio_client(server_parameters) as (read, write):
             async with ClientSession(read, write) as session:
                 await session.initialize()
-                
-                # Full Target List
-                specs_to_crawl = [
-                    '38.211', '38.212', '38.213', '38.214',
-                    '38.300', '38.321', '38.331', 
-                    '38.401', '38.413', '38.901'
-                ]
-                
-                base_ftp_path = '/Specs/archive/38_series'
-                base_url = 'https://www.3gpp.org/ftp'
-                
-                for spec in specs_to_crawl:
-                    spec_path = f'{base_ftp_path}/{spec}'
-                    print(f'\nChecking {spec_path}...')
-                    
-                    try:
-                        processed_blob_name = f'specs/processed/{spec}.txt'
-                        if self.blob_exists(processed_blob_name):
-                            print(f'Processed text for {spec} already in GCS. Skipping.')
-                            continue
-
-                        result = await session.call_tool('list_directories_files', arguments={'path': spec_path})
-                        
-                        filenames = []
-                        for item in result.content:
-                            if item.type == 'text':
-                                filenames.append(item.text)
-                        
-                        relevant_files = [f for f in filenames if re.search(r'-(g|h)\d+\.zip$', f)]
-                        
-                        if not relevant_files:
-                            print(f'No Rel-16/17 files found for {spec}')
-                            continue
-                            
-                        latest_file = sorted(relevant_files)[-1]
-                        # Fix: use spec name + version for stable naming if needed, but keeping original filename is fine
-                        print(f'Found latest file: {latest_file}')
-                        
-                        full_url = f'{base_url}{spec_path}/{latest_file}'
-                        
-                        print(f'Downloading {full_url} (in-memory)...')
-                        zip_buffer = io.BytesIO()
-                        try:
-                            with requests.get(full_url, stream=True, timeout=600) as r:
-                                r.raise_for_status()
-                                for chunk in r.iter_content(chunk_size=16384):
-                                    zip_buffer.write(chunk)
-                            print(f'Download complete ({zip_buffer.tell()} bytes).')
-                        except Exception as e:
-                            print(f'Download failed for {spec}: {e}')
-                            continue
-                            
-                        # Upload Raw ZIP
-                        raw_zip_blob = f'specs/raw/{latest_file}'
-                        self.upload_blob(zip_buffer, raw_zip_blob, 'application/zip')
-                        
-                        # Process
-                        try:
-                            with zipfile.ZipFile(zip_buffer, 'r') as zip_ref:
-                                extracted_files = zip_ref.namelist()
-                                doc_file = next((f for f in extracted_files if f.endswith('.docx')), None)
-                                
-                                if doc_file:
-                                    print(f'Processing {doc_file}...')
-                                    with zip_ref.open(doc_file) as doc_stream:
-                                        doc_buffer = io.BytesIO(doc_stream.read())
-                                        
-                                        # Upload Raw DOCX
-                                        raw_doc_blob = f'specs/raw/{doc_file}'
-                                        self.upload_blob(doc_buffer, raw_doc_blob, 'application/vnd.openxmlformats-officedocument.wordprocessingml.document')
-                                        
-                                        # Parse
-                                        doc = docx.Document(doc_buffer)
-                                        full_text = []
-                                        for para in doc.paragraphs:
-                                            full_text.append(para.text)
-                                        
-                                        # Use proper newline
-                                        content_text = '\n'.join(full_text)
-                                        
-                                        self.upload_blob(content_text, processed_blob_name, 'text/plain')
-                                        print(f'Successfully processed {spec}')
-                                else:
-                                    print('No .docx found in zip.')
-                        except Exception as e:
-                            print(f'Extraction/Processing failed: {e}')
-                            
-                    except Exception as e:
-                        print(f'Error crawling {spec}: {e}')
-
-                print('Cloud Crawler run complete.')
+
+                # Bound the number of specs in flight; each one holds a zip download and a docx parse
+                concurrency = concurrency or self.concurrency
+                semaphore = asyncio.Semaphore(concurrency)
+                # Own pool: the default executor's thread cap (min(32, cpus + 4)) would silently lower concurrency
+                executor = ThreadPoolExecutor(max_workers=concurrency)
+
+                listings = await asyncio.gather(*(self._find_latest_file(session, spec, semaphore) for spec in SPECS_TO_CRAWL))
+                latest_files = {spec: filename for spec, filename in zip(SPECS_TO_CRAWL, listings) if filename}
+
+                # Only versions the manifest has not seen yet are downloaded
+                to_fetch = self.manifest.diff(latest_files)
+                print(f'\n{len(to_fetch)} of {len(latest_files)} specs are new or updated.')
+
+                try:
+                    await asyncio.gather(*(self._crawl_spec(spec, filename, semaphore, executor) for spec, filename in to_fetch.items()))
+                finally:
+                    executor.shutdown(wait=False)
+
+        self.manifest.save(self.store)
+        if self.artifacts:
+            self.artifacts.save()
+        print('Cloud Crawler run complete.')
+
+    async def _find_latest_file(self, session, spec, semaphore):
+        spec_path = f'{BASE_FTP_PATH}/{spec}'
+
+        async with semaphore:
+            print(f'Checking {spec_path}...')
+
+            try:
+                result = await session.call_tool('list_directories_files', arguments={'path': spec_path})
+
+                filenames = []
+                for item in result.content:
+                    if item.type == 'text':
+                        filenames.append(item.text)
+
+                relevant_files = [f for f in filenames if (parse_spec_version(f) or '') >= config.SPEC_MIN_VERSION]
+
+                if not relevant_files:
+                    print(f'No Rel-16+ files found for {spec}')
+                    return None
+
+                latest_file = sorted(relevant_files, key=parse_spec_version)[-1]
+                print(f'Found latest file: {latest_file}')
+                return latest_file
+
+            except Exception as e:
+                print(f'Error listing {spec}: {e}')
+                return None
+
+    async def _crawl_spec(self, spec, latest_file, semaphore, executor):
+        async with semaphore:
+            try:
+                # Download, upload and parse are blocking; run them off the event loop so specs overlap
+                await asyncio.get_running_loop().run_in_executor(executor, self._fetch_and_process, spec, latest_file)
+            except Exception as e:
+                print(f'Error crawling {spec}: {e}')
+
+    def _download_to_spool(self, url):
+        # Spills to disk past SPOOL_MAX_BYTES so large specs never sit in RAM whole
+        spool = tempfile.SpooledTemporaryFile(max_size=config.SPOOL_MAX_BYTES)
+        digest = hashlib.sha256()
+        try:
+            with requests.get(url, stream=True, timeout=600) as r:
+                r.raise_for_status()
+                for chunk in r.iter_content(chunk_size=config.DOWNLOAD_CHUNK_SIZE):
+                    spool.write(chunk)
+                    digest.update(chunk)
+        except Exception:
+            spool.close()
+            raise
+        return spool, digest.hexdigest()
+
+    def _fetch_and_process(self, spec, latest_file):
+        full_url = f'{BASE_URL}{BASE_FTP_PATH}/{spec}/{latest_file}'
+        processed_blob_name = f'specs/processed/{spec}.txt'
+
+        print(f'Downloading {full_url} (spooled)...')
+        try:
+            zip_spool, sha256 = self._download_to_spool(full_url)
+            size = zip_spool.tell()
+            print(f'Download complete ({size} bytes).')
+        except Exception as e:
+            print(f'Download failed for {spec}: {e}')
+            return
+
+        with zip_spool:
+            previous = self.manifest.get(spec)
+            if previous and previous.get('sha256') == sha256:
+                # Re-published under a new name with identical bytes; nothing to redo
+                print(f'{latest_file} matches the crawled {previous["filename"]}. Skipping processing.')
+                self.manifest.record(spec, latest_file, size, sha256, previous.get('processed_blob', processed_blob_name))
+                self.manifest.save(self.store)
+                return
+
+            # Upload Raw ZIP
+            raw_zip_blob = f'specs/raw/{latest_file}'
+            zip_uploaded = self.upload_artifact(zip_spool, raw_zip_blob, 'application/zip', digest=sha256)
+
+            # Process
+            try:
+                with zipfile.ZipFile(zip_spool, 'r') as zip_ref:
+                    extracted_files = zip_ref.namelist()
+                    doc_file = next((f for f in extracted_files if f.endswith('.docx')), None)
+
+                    if doc_file:
+                        print(f'Processing {doc_file}...')
+                        # Inflate the member once; upload and parse both read the same spool
+                        with zip_ref.open(doc_file) as doc_stream, \
+                                tempfile.SpooledTemporaryFile(max_size=config.SPOOL_MAX_BYTES) as doc_spool:
+                            shutil.copyfileobj(doc_stream, doc_spool, config.DOWNLOAD_CHUNK_SIZE)
+
+                            # Upload Raw DOCX
+                            raw_doc_blob = f'specs/raw/{doc_file}'
+                            doc_uploaded = self.upload_artifact(doc_spool, raw_doc_blob, 'application/vnd.openxmlformats-officedocument.wordprocessingml.document')
+
+                            # Parse (streamed paragraph by paragraph, written straight to a spool)
+                            doc_spool.seek(0)
+                            with tempfile.SpooledTemporaryFile(max_size=config.SPOOL_MAX_BYTES) as text_spool:
+                                for i, para_text in enumerate(iter_body_paragraphs(doc_spool)):
+                                    if i:
+                                        text_spool.write(b'\n')
+                                    text_spool.write(para_text.encode('utf-8'))
+
+                                text_uploaded = self.upload_artifact(text_spool, processed_blob_name, 'text/plain', by_content=False)
+
+                            if not (zip_uploaded and doc_uploaded and text_uploaded):
+                                # Left out of the manifest so the next run retries this spec
+                                print(f'Uploads incomplete for {spec}. Not recording it as crawled.')
+                                return
+                            self.manifest.record(spec, latest_file, size, sha256, processed_blob_name)
+                            # Saved per spec, so an interrupted run keeps what it finished
+                            self.manifest.save(self.store)
+                            print(f'Successfully processed {spec}')
+                    else:
+                        print('No .docx found in zip.')
+            except Exception as e:
+                print(f'Extraction/Processing failed for {spec}: {e}')
 
 if __name__ == '__main__':
-    agent = ThreeGPPCrawler()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--concurrency', type=int, default=config.CRAWL_CONCURRENCY,
+                        help='Maximum number of specs downloaded and processed at once')
+    args = parser.parse_args()
+
+    agent = ThreeGPPCrawler(concurrency=args.concurrency)
     asyncio.run(agent.run())
@@ -4,15 +4,26 @@ import os
 FTP_HOST = 'ftp.3gpp.org'
 FTP_USER = 'anonymous'
 FTP_PASS = 'anonymous'
+FTP_HTTP_BASE_URL = 'https://www.3gpp.org/ftp' # HTTP mirror of the FTP tree used for downloads
 
 # Local Download Configuration
 BASE_DOWNLOAD_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
 
 # Target Directories on FTP
-TDOC_PATH_TEMPLATE = '/tsg_{wg}/WG{wg_num}_RL{wg_num}/TSG{wg}_{meeting}/Docs/'
-REPORT_PATH_TEMPLATE = '/tsg_{wg}/WG{wg_num}_RL{wg_num}/TSG{wg}_{meeting}/Report/'
+# {meeting} is the full meeting directory name, e.g. TSGR1_104-e
+WG_PATH_TEMPLATE = '/tsg_{tsg}/{wg_dir}/'
+TDOC_PATH_TEMPLATE = '/tsg_{tsg}/{wg_dir}/{meeting}/Docs/'
+REPORT_PATH_TEMPLATE = '/tsg_{tsg}/{wg_dir}/{meeting}/Report/'
 SPEC_SERIES_PATH_TEMPLATE = '/Specs/archive/{series}_series/'
 
+# Working Groups crawled for TDocs (meeting directories start with meeting_prefix)
+WORKING_GROUPS = {
+    'RAN1': {'tsg': 'ran', 'wg_dir': 'WG1_RL1', 'meeting_prefix': 'TSGR1_'},
+    'RAN2': {'tsg': 'ran', 'wg_dir': 'WG2_RL2', 'meeting_prefix': 'TSGR2_'},
+    'RAN3': {'tsg': 'ran', 'wg_dir': 'WG3_Iu', 'meeting_prefix': 'TSGR3_'},
+    'RAN4': {'tsg': 'ran', 'wg_dir': 'WG4_Radio', 'meeting_prefix': 'TSGR4_'},
+}
+
 # File Extensions to download
 ALLOWED_EXTENSIONS = {'.zip', '.doc', '.docx', '.pdf', '.txt'}
 
@@ -21,7 +32,82 @@ GCS_BUCKET_NAME = 'invention-platform-data-001'
 PROJECT_ID = 'still-manifest-478014-c1'
 REGION = 'us-central1'
 
+# Storage Backend ('gcs' or 'local'); the local backend mirrors the bucket layout on disk
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'gcs')
+LOCAL_STORAGE_DIR = os.environ.get('LOCAL_STORAGE_DIR', os.path.join(BASE_DOWNLOAD_DIR, 'blobstore'))
+STORAGE_MAX_WORKERS = int(os.environ.get('STORAGE_MAX_WORKERS', '16'))
+
+# Content-Addressed Raw Artifacts (deduplicated by sha256; index mapping names to hashes)
+CAS_PREFIX = 'specs/raw/sha256/'
+CAS_INDEX_PATH = os.path.join(BASE_DOWNLOAD_DIR, 'cas_index.json')
+CAS_INDEX_BLOB = 'specs/raw/index.json'
+
 # Vertex AI Configuration
 VECTOR_INDEX_DISPLAY_NAME = '3gpp-knowledge-base-index'
 VECTOR_INDEX_ENDPOINT_DISPLAY_NAME = '3gpp-knowledge-base-endpoint'
 VECTOR_INDEX_ENDPOINT_ID = 'projects/941721845440/locations/us-central1/indexEndpoints/2589132180110180352'
+
+# Crawl Concurrency (specs listed, downloaded, uploaded and parsed in parallel)
+CRAWL_CONCURRENCY = int(os.environ.get('CRAWL_CONCURRENCY', '4'))
+
+# Streaming Download Buffers (in-memory up to SPOOL_MAX_BYTES, then spilled to a temp file)
+SPOOL_MAX_BYTES = int(os.environ.get('SPOOL_MAX_BYTES', str(8 * 1024 * 1024)))
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Crawl Manifest (spec versions already crawled; local copy mirrored to GCS)
+CRAWL_MANIFEST_PATH = os.path.join(BASE_DOWNLOAD_DIR, 'crawl_manifest.json')
+CRAWL_MANIFEST_BLOB = 'specs/manifest.json'
+SPEC_MIN_VERSION = 'g00' # Rel-16 onwards
+
+# TDoc Meeting Crawler
+TDOC_DOWNLOAD_DIR = os.path.join(BASE_DOWNLOAD_DIR, 'tdocs')
+TDOC_FETCH_LOG = os.path.join(TDOC_DOWNLOAD_DIR, 'fetch_log.jsonl')
+TDOC_FETCH_CONCURRENCY = int(os.environ.get('TDOC_FETCH_CONCURRENCY', '16'))
+TDOC_REQUESTS_PER_SECOND = float(os.environ.get('TDOC_REQUESTS_PER_SECOND', '8'))
+TDOC_FETCH_RETRIES = 3
+
+# Parse Cache (TDocParser output keyed by document sha256, parse mode and parser version)
+PARSE_CACHE_PATH = os.environ.get('PARSE_CACHE_PATH', os.path.join(BASE_DOWNLOAD_DIR, 'parse_cache.sqlite'))
+
+# NLP Mode for query/claim processing: 'full' (en_core_web_sm pipeline), 'fast' (spaCy
+# tokenizer only, no model) or 'rule' (regex tokenizer with spaCy's stop list, no spaCy import)
+NLP_MODE = os.environ.get('NLP_MODE', 'fast')
+SPACY_MODEL = 'en_core_web_sm'
+
+# Chunking (characters; consecutive chunks share up to CHUNK_OVERLAP characters of whole units)
+CHUNK_SIZE = int(os.environ.get('CHUNK_SIZE', '1000'))
+CHUNK_OVERLAP = int(os.environ.get('CHUNK_OVERLAP', '100'))
+
+# Sentence segmentation inside long paragraphs: 'rule' (punctuation regex) or 'spacy' (spaCy's
+# rule-based sentencizer, run over SEGMENT_WINDOW-character windows so memory does not grow
+# with the document)
+SEGMENTATION_MODE = os.environ.get('SEGMENTATION_MODE', 'rule')
+SEGMENT_WINDOW = int(os.environ.get('SEGMENT_WINDOW', '100000'))
+
+# Embedding Cache (vectors keyed by model name and md5 of the chunk text; optionally mirrored
+# to the blob store as packs under EMBEDDING_CACHE_PREFIX)
+EMBEDDING_CACHE_PATH = os.environ.get('EMBEDDING_CACHE_PATH', os.path.join(BASE_DOWNLOAD_DIR, 'embedding_cache.sqlite'))
+EMBEDDING_CACHE_PREFIX = 'embeddings/cache/'
+EMBEDDING_CACHE_MIRROR = os.environ.get('EMBEDDING_CACHE_MIRROR', '0') == '1'
+
+# Embedding Client (concurrent requests under a shared rate limit; the batch size adapts
+# between EMBEDDING_INITIAL_BATCH_SIZE and the API maximum, also capped in characters)
+EMBEDDING_CONCURRENCY = int(os.environ.get('EMBEDDING_CONCURRENCY', '8'))
+EMBEDDING_REQUESTS_PER_SECOND = float(os.environ.get('EMBEDDING_REQUESTS_PER_SECOND', '5'))
+EMBEDDING_INITIAL_BATCH_SIZE = 16
+EMBEDDING_MAX_BATCH_SIZE = 250
+EMBEDDING_MAX_BATCH_CHARS = 60000
+EMBEDDING_RETRIES = 5
+
+# Embedding Backend: 'vertex' (Vertex AI EMBEDDING_MODEL, an error if unavailable), 'local'
+# (deterministic hashed n-gram vectors of the same dimension, no network) or 'auto' (Vertex,
+# falling back to local when it is unavailable). Indexes record the backend that filled them
+# and refuse vectors or queries from another one.
+EMBEDDING_BACKEND = os.environ.get('EMBEDDING_BACKEND', 'auto')
+EMBEDDING_MODEL = 'text-embedding-004'
+EMBEDDING_DIMENSION = 768
+
+# Local Search Index (directory written by brain.index_store; a path ending in .json is read
+# and written as the legacy JSON index)
+INDEX_PATH = os.environ.get('INDEX_PATH', 'brain/index')
+INDEX_MAX_SEGMENTS = int(os.environ.get('INDEX_MAX_SEGMENTS', '8'))
@@ -0,0 +1,105 @@
+import json
+import os
+import re
+import threading
+from typing import Dict, Optional
+
+# Spec archive names look like 38331-h40.zip: release letter + two version digits (0-9a-z)
+SPEC_VERSION_PATTERN = re.compile(r'-([a-z])([0-9a-z]{2})\.zip$')
+
+def parse_spec_version(filename: str) -> Optional[str]:
+    """Returns the version code of a spec archive name (e.g. 'h40'), or None."""
+    match = SPEC_VERSION_PATTERN.search(filename)
+    if not match:
+        return None
+    return match.group(1) + match.group(2)
+
+class CrawlManifest:
+    """
+    Records which version of every spec has been crawled.
+
+    Entries are keyed by spec number and hold the source filename, version code, byte size,
+    sha256 of the archive and the processed blob name. The manifest lives in a local JSON file
+    and is mirrored to a single blob in the storage backend, so an incremental crawl costs one
+    read and at most one write instead of an existence check per spec.
+    """
+
+    def __init__(self, path: str, blob_name: str):
+        self.path = path
+        self.blob_name = blob_name
+        self.entries: Dict[str, Dict] = {}
+        self.dirty = False
+        self._lock = threading.Lock()
+        # Serializes whole saves, so an older payload never overwrites a newer one in the store
+        self._save_lock = threading.Lock()
+
+    def load(self, store=None):
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+            print(f'Loaded crawl manifest ({len(self.entries)} specs) from {self.path}')
+            return
+
+        if store is not None:
+            try:
+                if store.exists(self.blob_name):
+                    self.entries = json.loads(store.get_text(self.blob_name))
+                    print(f'Loaded crawl manifest ({len(self.entries)} specs) from {store.uri(self.blob_name)}')
+                    self._write_local()
+                    return
+            except Exception as e:
+                print(f'Warning: Failed to fetch crawl manifest: {e}')
+
+        print('No crawl manifest found. Starting fresh.')
+        self.entries = {}
+
+    def save(self, store=None):
+        """Writes the manifest locally and mirrors it to store. Safe to call from crawl threads."""
+        with self._save_lock:
+            with self._lock:
+                if not self.dirty:
+                    return
+                payload = json.dumps(self.entries, indent=2, sort_keys=True)
+                self._write_local(payload)
+                self.dirty = False
+
+            if store is not None:
+                try:
+                    store.put(self.blob_name, payload, 'application/json')
+                    print(f'Uploaded crawl manifest to {store.uri(self.blob_name)}')
+                except Exception as e:
+                    print(f'Warning: Failed to upload crawl manifest: {e}')
+                    with self._lock:
+                        self.dirty = True
+
+    def _write_local(self, payload: Optional[str] = None):
+        if payload is None:
+            payload = json.dumps(self.entries, indent=2, sort_keys=True)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(payload)
+        os.replace(tmp_path, self.path)
+
+    def diff(self, latest_files: Dict[str, str]) -> Dict[str, str]:
+        """Returns the subset of {spec: filename} whose filename differs from the recorded one."""
+        with self._lock:
+            return {
+                spec: filename for spec, filename in latest_files.items()
+                if self.entries.get(spec, {}).get('filename') != filename
+            }
+
+    def get(self, spec: str) -> Optional[Dict]:
+        with self._lock:
+            return self.entries.get(spec)
+
+    def record(self, spec: str, filename: str, size: int, sha256: str, processed_blob: str):
+        with self._lock:
+            self.entries[spec] = {
+                'filename': filename,
+                'version': parse_spec_version(filename),
+                'size': size,
+                'sha256': sha256,
+                'processed_blob': processed_blob,
+            }
+            self.dirty = True
@@ -0,0 +1,218 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+import requests
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from crawler import config
+from crawler.ratelimit import TokenBucket
+
+TDocJob = namedtuple('TDocJob', ['wg', 'meeting', 'filename', 'ftp_path'])
+
+class TDocMeetingCrawler:
+    """
+    Crawls TDoc contributions meeting by meeting.
+
+    Meetings are enumerated per working group over MCP, every meeting's Docs/ folder is listed
+    concurrently, and the resulting files go through a bounded, rate-limited fetch queue.
+    Completed downloads are appended to a fetch log so an interrupted crawl resumes where it
+    stopped; partially downloaded files are continued with HTTP range requests.
+    """
+
+    def __init__(self,
+                 working_groups: Optional[List[str]] = None,
+                 meetings: Optional[List[str]] = None,
+                 concurrency: int = config.TDOC_FETCH_CONCURRENCY,
+                 requests_per_second: float = config.TDOC_REQUESTS_PER_SECOND,
+                 download_dir: str = config.TDOC_DOWNLOAD_DIR,
+                 fetch_log: str = config.TDOC_FETCH_LOG):
+        self.working_groups = working_groups or list(config.WORKING_GROUPS)
+        self.meetings = set(meetings) if meetings else None
+        self.concurrency = max(1, concurrency)
+        self.rate_limiter = TokenBucket(requests_per_second)
+        self.download_dir = download_dir
+        self.fetch_log = fetch_log
+        self.completed = set()
+        self.failed = []
+        self.fetched_count = 0
+        self._log_lock = threading.Lock()
+
+    def _load_fetch_log(self):
+        if not os.path.exists(self.fetch_log):
+            return
+        with open(self.fetch_log, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    self.completed.add(json.loads(line)['path'])
+                except (ValueError, KeyError):
+                    # A torn last line from a killed run; the file is simply fetched again
+                    continue
+        print(f'Resuming: {len(self.completed)} TDocs already fetched.')
+
+    def _record_fetched(self, job: TDocJob, size: int):
+        with self._log_lock:
+            os.makedirs(os.path.dirname(self.fetch_log), exist_ok=True)
+            with open(self.fetch_log, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'path': job.ftp_path, 'size': size}) + '\n')
+            self.completed.add(job.ftp_path)
+            self.fetched_count += 1
+            if self.fetched_count % 100 == 0:
+                print(f'  Fetched {self.fetched_count} TDocs...')
+
+    async def run(self):
+        self._load_fetch_log()
+
+        server_parameters = StdioServerParameters(
+            command=sys.executable,
+            args=['-m', 'mcp_3gpp_ftp.server'],
+            env=os.environ.copy()
+        )
+
+        async with stdio_client(server_parameters) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+
+                semaphore = asyncio.Semaphore(self.concurrency)
+                meetings = []
+                for wg in self.working_groups:
+                    meetings.extend(await self._list_meetings(session, wg))
+                print(f'Found {len(meetings)} meetings across {len(self.working_groups)} working groups.')
+
+                listings = await asyncio.gather(*(self._list_tdocs(session, wg, meeting, semaphore) for wg, meeting in meetings))
+
+        all_jobs = [job for listing in listings for job in listing]
+        jobs = [job for job in all_jobs if job.ftp_path not in self.completed]
+        print(f'{len(jobs)} TDocs to fetch ({len(all_jobs) - len(jobs)} already fetched).')
+
+        await self._fetch_all(jobs)
+
+        print(f'TDoc crawl complete: {self.fetched_count} fetched, {len(self.failed)} failed.')
+        for ftp_path, error in self.failed:
+            print(f'  Failed {ftp_path}: {error}')
+
+    async def _list_names(self, session, path: str) -> List[str]:
+        result = await session.call_tool('list_directories_files', arguments={'path': path})
+        names = []
+        for item in result.content:
+            if item.type == 'text':
+                names.append(item.text.strip().rstrip('/'))
+        return names
+
+    async def _list_meetings(self, session, wg: str):
+        wg_config = config.WORKING_GROUPS[wg]
+        wg_path = config.WG_PATH_TEMPLATE.format(**wg_config)
+        try:
+            names = await self._list_names(session, wg_path)
+        except Exception as e:
+            print(f'Error listing meetings for {wg}: {e}')
+            return []
+
+        meetings = [n for n in names if n.startswith(wg_config['meeting_prefix'])]
+        if self.meetings:
+            meetings = [m for m in meetings if m in self.meetings]
+        return [(wg, meeting) for meeting in sorted(meetings)]
+
+    async def _list_tdocs(self, session, wg: str, meeting: str, semaphore) -> List[TDocJob]:
+        docs_path = config.TDOC_PATH_TEMPLATE.format(meeting=meeting, **config.WORKING_GROUPS[wg])
+        async with semaphore:
+            try:
+                names = await self._list_names(session, docs_path)
+            except Exception as e:
+                print(f'Error listing {docs_path}: {e}')
+                return []
+
+        jobs = []
+        for name in names:
+            if os.path.splitext(name)[1].lower() in config.ALLOWED_EXTENSIONS:
+                jobs.append(TDocJob(wg, meeting, name, f'{docs_path}{name}'))
+        print(f'{meeting}: {len(jobs)} TDocs listed.')
+        return jobs
+
+    async def _fetch_all(self, jobs: List[TDocJob]):
+        queue = asyncio.Queue()
+        for job in jobs:
+            queue.put_nowait(job)
+
+        loop = asyncio.get_running_loop()
+        # Own pool: the default executor's thread cap (min(32, cpus + 4)) would silently lower concurrency
+        executor = ThreadPoolExecutor(max_workers=self.concurrency)
+
+        async def worker():
+            while True:
+                try:
+                    job = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                await loop.run_in_executor(executor, self._fetch_with_retries, job)
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(jobs)))))
+        finally:
+            executor.shutdown(wait=False)
+
+    def _fetch_with_retries(self, job: TDocJob):
+        for attempt in range(config.TDOC_FETCH_RETRIES):
+            try:
+                self._fetch(job)
+                return
+            except Exception as e:
+                if attempt == config.TDOC_FETCH_RETRIES - 1:
+                    with self._log_lock:
+                        self.failed.append((job.ftp_path, str(e)))
+                    return
+                time.sleep(2 ** attempt + random.random())
+
+    def _fetch(self, job: TDocJob):
+        dest_path = os.path.join(self.download_dir, job.wg, job.meeting, job.filename)
+        part_path = f'{dest_path}.part'
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+
+        # Continue a partial download from a previous run instead of starting over
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+
+        self.rate_limiter.acquire()
+        with requests.get(f'{config.FTP_HTTP_BASE_URL}{job.ftp_path}', headers=headers, stream=True, timeout=120) as r:
+            if offset and r.status_code == 416:
+                # Nothing left to send: the partial file is already complete
+                pass
+            else:
+                r.raise_for_status()
+                mode = 'ab' if offset and r.status_code == 206 else 'wb'
+                with open(part_path, mode) as f:
+                    for chunk in r.iter_content(chunk_size=config.DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+
+        os.replace(part_path, dest_path)
+        self._record_fetched(job, os.path.getsize(dest_path))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fetch TDocs for 3GPP working group meetings.')
+    parser.add_argument('--wg', nargs='+', choices=sorted(config.WORKING_GROUPS), help='Working groups to crawl (default: all)')
+    parser.add_argument('--meetings', nargs='+', help='Meeting directory names to restrict to, e.g. TSGR1_104-e')
+    parser.add_argument('--concurrency', type=int, default=config.TDOC_FETCH_CONCURRENCY, help='Parallel downloads')
+    parser.add_argument('--rate', type=float, default=config.TDOC_REQUESTS_PER_SECOND, help='Maximum download requests per second (0 = unlimited)')
+    args = parser.parse_args()
+
+    crawler = TDocMeetingCrawler(
+        working_groups=args.wg,
+        meetings=args.meetings,
+        concurrency=args.concurrency,
+        requests_per_second=args.rate
+    )
+    asyncio.run(crawler.run())
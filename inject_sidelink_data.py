@@ -1,25 +1,16 @@
-import json
 import os
 import sys
-import numpy as np
 
 # Add project root to sys.path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from crawler import config
+from brain.index_store import SegmentedIndex
 from brain.vectorizer import EmbeddingGenerator
 
 def inject_data():
-    index_file = "brain/index.json"
-    
-    if not os.path.exists(index_file):
-        print(f"Error: {index_file} not found.")
-        return
-
-    print(f"Loading {index_file}...")
-    with open(index_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-        
-    print(f"Current index size: {len(data)} chunks.")
+    index = SegmentedIndex(config.INDEX_PATH)
+    print(f"Current index: {len(index.segments())} segments.")
     
     # Sample Sidelink Data
     new_docs = [
@@ -60,16 +51,10 @@ def inject_data():
     # It returns a list of objects with an 'embedding' attribute
     embedded_docs = embedder.generate_embeddings(new_docs)
     
-    for i, doc in enumerate(new_docs):
-        # Add embedding to the doc dict
-        doc['embedding'] = embedded_docs[i].embedding
-        data.append(doc)
-        
-    print(f"New index size: {len(data)} chunks.")
-    
-    print(f"Saving to {index_file}...")
-    with open(index_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2)
+    # New chunks land in their own segment; the rest of the index is not rewritten
+    print(f"Adding {len(embedded_docs)} chunks to {config.INDEX_PATH}...")
+    index.add(embedded_docs, embedder.backend_name)
+    index.wait()
         
     print("Injection complete.")
 
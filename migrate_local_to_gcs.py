@@ -1,13 +1,10 @@
 import os
 import glob
-from google.cloud import storage
-from crawler import config
+from brain.blobstore import get_blob_store
 
 def migrate_local():
-    print(f'Starting migration of local data to {config.GCS_BUCKET_NAME}...')
-    
-    storage_client = storage.Client(project=config.PROJECT_ID)
-    bucket = storage_client.bucket(config.GCS_BUCKET_NAME)
+    store = get_blob_store()
+    print(f'Starting migration of local data to {store.uri("")}...')
     
     local_dir = 'data/specs'
     files = glob.glob(os.path.join(local_dir, '*.txt'))
@@ -18,18 +15,10 @@ def migrate_local():
 
     print(f'Found {len(files)} local files to upload.')
     
-    for file_path in files:
-        filename = os.path.basename(file_path)
-        blob_name = f'specs/processed/{filename}'
-        
-        blob = bucket.blob(blob_name)
-        print(f'Uploading {filename} to gs://{config.GCS_BUCKET_NAME}/{blob_name}...')
-        
-        try:
-            blob.upload_from_filename(file_path)
-            print('  Success.')
-        except Exception as e:
-            print(f'  Failed: {e}')
+    # Upload in parallel; one blocking upload at a time leaves most of the bandwidth idle
+    uploads = [(f'specs/processed/{os.path.basename(file_path)}', file_path, 'text/plain') for file_path in files]
+    failed = store.put_files(uploads)
+    print(f'Uploaded {len(uploads) - len(failed)} of {len(uploads)} files.')
 
     print('Migration complete.')
 
@@ -1,12 +1,14 @@
 import os
 import sys
 import hashlib
-from crawler import config
+from brain.chunks import ChunkStore
 from brain.indexer import ChunkingStrategy
+from brain.embedding_cache import get_embedding_cache
+from brain.embeddings import get_embedding_backend
 from brain.vectorizer import EmbeddingGenerator
 from brain.vertex_indexer import VertexAIIndexer
 from brain.docstore import DocStore
-from google.cloud import storage
+from brain.blobstore import get_blob_store
 
 # Ensure project root in path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -14,32 +16,29 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 def run_cloud_pipeline():
     print('=== Starting 3GPP Cloud Pipeline (Firestore Enabled) ===')
 
-    # 1. Load from GCS
-    print('\n[Phase 1] LoadingSpecs from GCS...')
-    storage_client = storage.Client(project=config.PROJECT_ID)
-    bucket = storage_client.bucket(config.GCS_BUCKET_NAME)
-    blobs = list(bucket.list_blobs(prefix='specs/processed/'))
+    # 1. Load from storage
+    print('\n[Phase 1] LoadingSpecs from storage...')
+    store = get_blob_store()
+    blob_names = [name for name in store.list('specs/processed/') if name.endswith('.txt')]
     
-    print(f'Found {len(blobs)} specification files in gs://{config.GCS_BUCKET_NAME}/specs/processed/')
+    print(f'Found {len(blob_names)} specification files in {store.uri("specs/processed/")}')
     
     chunker = ChunkingStrategy()
-    all_chunks = []
+    all_chunks = ChunkStore()
 
-    for blob in blobs:
-        if not blob.name.endswith('.txt'):
-            continue
-            
-        print(f'  Processing {blob.name}...')
+    # Specs are downloaded a small parallel batch at a time, not all up front
+    for blob_name, data in store.iter_many(blob_names):
+        print(f'  Processing {blob_name}...')
         try:
-            text = blob.download_as_text()
-            filename = os.path.basename(blob.name)
+            text = data.decode('utf-8')
+            filename = os.path.basename(blob_name)
             spec_name = filename.replace('.txt', '')
             
             doc_data = {
                 'content': text,
                 'metadata': {
                     'source': f'3GPP TS {spec_name}',
-                    'gcs_uri': f'gs://{config.GCS_BUCKET_NAME}/{blob.name}',
+                    'gcs_uri': store.uri(blob_name),
                     'type': 'Technical Specification'
                 }
             }
@@ -52,17 +51,19 @@ def run_cloud_pipeline():
             print(f'    -> Extracted {len(chunks)} chunks.')
             
         except Exception as e:
-            print(f'    Error processing {blob.name}: {e}')
+            print(f'    Error processing {blob_name}: {e}')
 
     # 2. Embed & Index & Store Text
     print(f'\n[Phase 2] Embedding, Indexing, and Storing {len(all_chunks)} chunks...')
     if all_chunks:
         # Initialize Services
         docstore = DocStore()
-        embedder = EmbeddingGenerator()
+        # The Vector Search index holds Vertex embeddings: never fall back to local vectors
+        embedder = EmbeddingGenerator(cache=get_embedding_cache(), backend=get_embedding_backend('vertex'))
         
         # A. Embed in batches
         vectorized_chunks = embedder.generate_embeddings(all_chunks)
+        embedder.close()
         
         # B. Store Text in Firestore
         print('  Uploading Text to Firestore...')
@@ -8,7 +8,9 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 if current_dir not in sys.path:
     sys.path.append(current_dir)
 
+from brain.chunks import ChunkStore
 from brain.indexer import ChunkingStrategy
+from brain.embedding_cache import get_embedding_cache
 from brain.vectorizer import EmbeddingGenerator, Indexer
 
 def run_pipeline():
@@ -31,7 +33,7 @@ def run_pipeline():
 
     print(f'Found {len(files)} specification files: {[os.path.basename(f) for f in files]}')
     
-    all_chunks = []
+    all_chunks = ChunkStore()
     
     for file_path in files:
         print(f'  Processing {os.path.basename(file_path)}...')
@@ -66,14 +68,15 @@ def run_pipeline():
     print(f'Total chunks to index: {len(all_chunks)}')
     
     if all_chunks:
-        embedder = EmbeddingGenerator()
-        indexer = Indexer() # Defaults to brain/index.json
+        embedder = EmbeddingGenerator(cache=get_embedding_cache())
+        indexer = Indexer() # Defaults to brain/index (config.INDEX_PATH)
         
         print('  Generating embeddings...')
         vectorized_chunks = embedder.generate_embeddings(all_chunks)
+        embedder.close()
         
         print('  Indexing...')
-        indexer.upload_vectors(vectorized_chunks)
+        indexer.upload_vectors(vectorized_chunks, embedder.backend_name, replace_field='source')
         
     print('\n=== Indexing Complete ===')
 
@@ -0,0 +1,199 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+from typing import Iterable, List, Optional, Set
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crawler import config
+from refinery.cache import ParseCache
+from refinery.classifier import DocumentClassifier
+from refinery.parser import PARSE_MODES, TDocParser
+
+SHARD_NAME_TEMPLATE = 'part-{:05d}.jsonl'
+
+RECORD_FORMAT = """\
+Each output line is one JSON record:
+  {"path": ..., "ok": true, "result": {"metadata", "cr_fields", "content", "chunks"}}
+  {"path": ..., "ok": false, "error": "..."}
+
+Unlike TDocParser.parse(), "chunks" is columnar (brain.chunks.ChunkStore.to_json();
+load it with ChunkStore.from_json()):
+  texts          chunk texts
+  doc            per chunk, index into documents (each document's metadata dict)
+  section        per chunk, index into sections (-1: no section)
+  start, end     per chunk, character offsets in the document (-1: unknown)
+  with_chunk_ids whether chunk metadata includes 'chunk_id'
+A chunk's metadata is documents[doc] plus 'section' when it has one.
+"""
+
+# Per-process state, set up once by the pool initializer
+_worker_mode = None
+_worker_classifier = None
+_worker_cache = None
+
+def _init_worker(mode: str, cache_path: Optional[str]):
+    global _worker_mode, _worker_classifier, _worker_cache
+    _worker_mode = mode
+    _worker_classifier = DocumentClassifier()
+    _worker_cache = ParseCache(cache_path) if cache_path else None
+
+def _parse_one(path: str) -> dict:
+    try:
+        parser = TDocParser(path, mode=_worker_mode, classifier=_worker_classifier, cache=_worker_cache)
+        # Columnar chunks keep the pickled result small and skip building per-chunk dicts
+        result = parser.parse(columnar=True)
+    except Exception as e:
+        return {'path': path, 'ok': False, 'error': f'{type(e).__name__}: {e}'}
+    if result is None:
+        return {'path': path, 'ok': False, 'error': parser.error or 'Unknown error'}
+    return {'path': path, 'ok': True, 'result': result}
+
+def collect_inputs(source: str) -> List[str]:
+    """
+    Returns the .docx paths to parse. source is either a directory (searched recursively) or a
+    manifest file listing one path per line; relative manifest paths resolve against the manifest.
+    """
+    if os.path.isdir(source):
+        paths = glob.glob(os.path.join(source, '**', '*.docx'), recursive=True)
+        return sorted(os.path.abspath(p) for p in paths)
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    paths = []
+    with open(source, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            paths.append(os.path.abspath(os.path.join(base_dir, line)))
+    return paths
+
+class BatchWriter:
+    """
+    Appends result records as JSON lines, either to one file or to rolling shard files of at
+    most `shard_size` records in a directory. Every record is flushed as it is written, so the
+    output is always readable up to the last completed document.
+    """
+
+    def __init__(self, output: str, shard_size: int = 0):
+        self.output = output
+        self.shard_size = shard_size
+        self._file = None
+        self._shard_index = 0
+        self._shard_count = 0
+
+    def _output_files(self) -> List[str]:
+        if not self.shard_size:
+            return [self.output] if os.path.exists(self.output) else []
+        return sorted(glob.glob(os.path.join(self.output, 'part-*.jsonl')))
+
+    def load_done(self, retry_failed: bool = False) -> Set[str]:
+        """Returns the paths already recorded by a previous run."""
+        done = set()
+        for path in self._output_files():
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn last line from a killed run; that document is parsed again
+                        continue
+                    if record.get('ok') or not retry_failed:
+                        done.add(record['path'])
+        if self.shard_size:
+            # Never append to an old shard; continue numbering after the last one
+            self._shard_index = len(self._output_files())
+        return done
+
+    def _open(self, path: str):
+        # Terminate a torn last line so the next record starts on its own line
+        needs_newline = False
+        if os.path.exists(path) and os.path.getsize(path):
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b'\n'
+        self._file = open(path, 'a', encoding='utf-8')
+        if needs_newline:
+            self._file.write('\n')
+
+    def write(self, record: dict):
+        if self.shard_size:
+            if self._file is None or self._shard_count >= self.shard_size:
+                self.close()
+                os.makedirs(self.output, exist_ok=True)
+                self._open(os.path.join(self.output, SHARD_NAME_TEMPLATE.format(self._shard_index)))
+                self._shard_index += 1
+                self._shard_count = 0
+            self._shard_count += 1
+        elif self._file is None:
+            output_dir = os.path.dirname(os.path.abspath(self.output))
+            os.makedirs(output_dir, exist_ok=True)
+            self._open(self.output)
+
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+def run_batch(paths: Iterable[str], writer: BatchWriter, workers: Optional[int] = None,
+              mode: str = 'fast', chunksize: int = 4, retry_failed: bool = False,
+              cache_path: Optional[str] = config.PARSE_CACHE_PATH):
+    done = writer.load_done(retry_failed)
+    paths = [p for p in dict.fromkeys(paths) if p not in done]
+    workers = max(1, workers or os.cpu_count() or 1)
+    print(f'{len(paths)} documents to parse ({len(done)} already done) with {workers} workers.')
+    if not paths:
+        return 0, 0
+
+    parsed = failed = 0
+    start = time.time()
+    try:
+        with Pool(processes=workers, initializer=_init_worker, initargs=(mode, cache_path)) as pool:
+            # Results are written in completion order so one slow document never stalls the stream
+            for record in pool.imap_unordered(_parse_one, paths, chunksize=chunksize):
+                writer.write(record)
+                if record['ok']:
+                    parsed += 1
+                else:
+                    failed += 1
+                total = parsed + failed
+                if total % 100 == 0:
+                    rate = total / max(time.time() - start, 1e-9)
+                    print(f'  {total}/{len(paths)} documents ({rate:.1f}/s)...')
+    finally:
+        writer.close()
+
+    print(f'Batch complete: {parsed} parsed, {failed} failed in {time.time() - start:.1f}s.')
+    return parsed, failed
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Parse a directory or manifest of TDoc .docx files in parallel.',
+                                         epilog=RECORD_FORMAT, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('source', help='Directory of .docx files or a manifest with one path per line')
+    arg_parser.add_argument('--output', required=True, help='JSONL output file, or a directory of shards with --shard-size')
+    arg_parser.add_argument('--shard-size', type=int, default=0, help='Records per shard file (0 = single JSONL file)')
+    arg_parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: all cores)')
+    arg_parser.add_argument('--mode', choices=PARSE_MODES, default='fast', help='Parser mode')
+    arg_parser.add_argument('--chunksize', type=int, default=4, help='Documents handed to a worker at a time')
+    arg_parser.add_argument('--cache', default=config.PARSE_CACHE_PATH, help='Parse cache database')
+    arg_parser.add_argument('--no-cache', action='store_true', help='Always parse, bypassing the parse cache')
+    arg_parser.add_argument('--retry-failed', action='store_true', help='Parse documents that failed in a previous run again')
+    args = arg_parser.parse_args()
+
+    run_batch(
+        collect_inputs(args.source),
+        BatchWriter(args.output, args.shard_size),
+        workers=args.workers,
+        mode=args.mode,
+        chunksize=args.chunksize,
+        retry_failed=args.retry_failed,
+        cache_path=None if args.no_cache else args.cache
+    )
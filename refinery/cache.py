@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import zlib
+from typing import Optional
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crawler import config
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS parse_results (
+    sha256 TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    result BLOB NOT NULL,
+    PRIMARY KEY (sha256, mode)
+);
+CREATE TABLE IF NOT EXISTS file_hashes (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+"""
+
+class ParseCache:
+    """
+    On-disk cache of TDocParser results in a SQLite database.
+
+    Results are keyed by the sha256 of the document and the parse mode, and stamped with the
+    parser version of that mode: an entry written by an older version is treated as a miss and
+    overwritten, so a parser change only invalidates the mode it touches. File hashes are
+    remembered by (path, size, mtime) so an unchanged corpus is not even re-read.
+
+    WAL journaling lets several batch worker processes read and write the same database.
+    """
+
+    def __init__(self, path: str = config.PARSE_CACHE_PATH):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def file_hash(self, path: str) -> str:
+        """Returns the sha256 of a file, reusing the recorded hash while size and mtime are unchanged."""
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT sha256 FROM file_hashes WHERE path = ? AND size = ? AND mtime_ns = ?',
+                (key, stat.st_size, stat.st_mtime_ns)
+            ).fetchone()
+        if row:
+            return row[0]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+        sha256 = digest.hexdigest()
+
+        with self._lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO file_hashes (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)',
+                (key, stat.st_size, stat.st_mtime_ns, sha256)
+            )
+            self.conn.commit()
+        return sha256
+
+    def get(self, sha256: str, mode: str, version: int) -> Optional[dict]:
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT result FROM parse_results WHERE sha256 = ? AND mode = ? AND version = ?',
+                (sha256, mode, version)
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, sha256: str, mode: str, version: int, result: dict):
+        payload = zlib.compress(json.dumps(result, ensure_ascii=False).encode('utf-8'))
+        with self._lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO parse_results (sha256, mode, version, result) VALUES (?, ?, ?, ?)',
+                (sha256, mode, version, payload)
+            )
+            self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,179 @@
+import zipfile
+from typing import Iterator
+
+from lxml import etree
+
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+DOCUMENT_PART = 'word/document.xml'
+
+def _w(tag: str) -> str:
+    return f'{{{W_NS}}}{tag}'
+
+W_BODY = _w('body')
+W_P = _w('p')
+W_R = _w('r')
+W_T = _w('t')
+W_INS = _w('ins')
+W_TBL = _w('tbl')
+W_TR = _w('tr')
+W_TC = _w('tc')
+W_TRPR = _w('trPr')
+W_TCPR = _w('tcPr')
+W_GRID_BEFORE = _w('gridBefore')
+W_GRID_SPAN = _w('gridSpan')
+W_VMERGE = _w('vMerge')
+W_VAL = _w('val')
+W_HYPERLINK = _w('hyperlink')
+
+# Run children rendered as text, mirroring python-docx's Run.text
+RUN_TEXT_TAGS = {
+    _w('tab'): '\t',
+    _w('ptab'): '\t',
+    _w('cr'): '\n',
+    _w('br'): '\n',
+    _w('noBreakHyphen'): '-',
+}
+
+def run_text(run) -> str:
+    """Returns the text of a w:r element."""
+    parts = []
+    for child in run:
+        if child.tag == W_T:
+            if child.text:
+                parts.append(child.text)
+        elif child.tag in RUN_TEXT_TAGS:
+            parts.append(RUN_TEXT_TAGS[child.tag])
+    return ''.join(parts)
+
+def paragraph_text(paragraph) -> str:
+    """Returns the text of a w:p element the way python-docx's Paragraph.text does."""
+    parts = []
+    for child in paragraph:
+        if child.tag == W_R:
+            parts.append(run_text(child))
+        elif child.tag == W_HYPERLINK:
+            for sub in child:
+                if sub.tag == W_R:
+                    parts.append(run_text(sub))
+    return ''.join(parts)
+
+def clean_paragraph_text(paragraph) -> str:
+    """
+    Returns the text of a w:p element with Track Changes resolved: insertions are kept and
+    deletions dropped (deleted runs sit in w:del and carry w:delText, never w:t).
+    """
+    parts = []
+    for child in paragraph:
+        if child.tag == W_R:
+            parts.append(run_text(child))
+        elif child.tag in (W_INS, W_HYPERLINK):
+            for sub in child:
+                if sub.tag == W_R:
+                    parts.append(run_text(sub))
+    return ''.join(parts).strip()
+
+def cell_text(tc) -> str:
+    """Returns the text of a w:tc element the way python-docx's _Cell.text does."""
+    return '\n'.join(paragraph_text(p) for p in tc.iterchildren(W_P))
+
+def _int_val(parent, prop_tag, value_tag, default):
+    props = parent.find(prop_tag)
+    if props is None:
+        return default
+    elem = props.find(value_tag)
+    if elem is None:
+        return default
+    try:
+        return int(elem.get(W_VAL))
+    except (TypeError, ValueError):
+        return default
+
+def _is_vmerge_continuation(tc) -> bool:
+    props = tc.find(W_TCPR)
+    if props is None:
+        return False
+    vmerge = props.find(W_VMERGE)
+    return vmerge is not None and vmerge.get(W_VAL, 'continue') == 'continue'
+
+def row_cells(tr, above: dict):
+    """
+    Returns (cells, grid) for a w:tr element, matching python-docx's _Row.cells: a horizontally
+    spanned cell repeats once per grid column and a vertical merge continuation repeats the text
+    of the cell above. `above` is the grid returned for the previous row of the same table.
+    """
+    cells = []
+    grid = {}
+    offset = _int_val(tr, W_TRPR, W_GRID_BEFORE, 0)
+    for tc in tr.iterchildren(W_TC):
+        span = max(1, _int_val(tc, W_TCPR, W_GRID_SPAN, 1))
+        text = above.get(offset, '') if _is_vmerge_continuation(tc) else cell_text(tc)
+        for k in range(span):
+            cells.append(text)
+            grid[offset + k] = text
+        offset += span
+    return cells, grid
+
+def _release(elem):
+    # Drop the element and everything before it so the tree never grows past one body block
+    elem.clear()
+    parent = elem.getparent()
+    if parent is not None:
+        while elem.getprevious() is not None:
+            del parent[0]
+
+def iter_body_paragraphs(docx_file) -> Iterator[str]:
+    """
+    Streams the text of the top-level body paragraphs of a .docx (same set as Document.paragraphs).
+
+    docx_file may be a path or a seekable binary file object. Memory stays bounded by the
+    largest single paragraph or table, not by the document size.
+    """
+    with zipfile.ZipFile(docx_file) as package:
+        with package.open(DOCUMENT_PART) as xml_stream:
+            for _, elem in etree.iterparse(xml_stream, events=('end',), tag=(W_P, W_TBL)):
+                parent = elem.getparent()
+                if parent is None or parent.tag != W_BODY:
+                    # Paragraphs inside tables are released together with their table
+                    continue
+                if elem.tag == W_P:
+                    yield paragraph_text(elem)
+                _release(elem)
+
+def iter_blocks(docx_file, plain_paragraphs: int = 0) -> Iterator[tuple]:
+    """
+    Streams the body of a .docx in document order as:
+      ('paragraph', clean_text, text) for each top-level body paragraph, where clean_text has
+          Track Changes resolved (see clean_paragraph_text) and text follows Paragraph.text.
+          text is only computed for the first `plain_paragraphs` paragraphs and is None after;
+      ('row', cells) for each row of a top-level table, cells as in row_cells().
+
+    Nested tables are only visible through the text of the cells that contain them.
+    """
+    with zipfile.ZipFile(docx_file) as package:
+        with package.open(DOCUMENT_PART) as xml_stream:
+            paragraph_count = 0
+            above = {}
+            for _, elem in etree.iterparse(xml_stream, events=('end',), tag=(W_P, W_TBL, W_TR)):
+                parent = elem.getparent()
+                if parent is None:
+                    continue
+
+                if elem.tag == W_TR:
+                    table = parent
+                    if table.getparent() is not None and table.getparent().tag == W_BODY:
+                        cells, above = row_cells(elem, above)
+                        yield ('row', cells)
+                        _release(elem)
+                    continue
+
+                if parent.tag != W_BODY:
+                    # Nested tables and cell paragraphs are consumed through their enclosing row
+                    continue
+
+                if elem.tag == W_TBL:
+                    above = {}
+                else:
+                    text = paragraph_text(elem) if paragraph_count < plain_paragraphs else None
+                    paragraph_count += 1
+                    yield ('paragraph', clean_paragraph_text(elem), text)
+                _release(elem)
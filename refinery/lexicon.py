@@ -0,0 +1,380 @@
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+from array import array
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional, Tuple
+
+REFINERY_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ACRONYMS_PATH = os.path.join(REFINERY_DIR, 'acronyms_final.json')
+DEFAULT_CUSTOM_ACRONYMS_PATH = os.path.join(REFINERY_DIR, 'custom_acronyms.json')
+DEFAULT_LEXICON_PATH = os.path.join(REFINERY_DIR, 'acronyms.lex')
+
+MAGIC = b'3GPPLEX\0'
+# Bumped when the layout or the compiled content rules change, so stale artifacts are rebuilt
+FORMAT_VERSION = 2
+HEADER = struct.Struct('<8sII')       # magic, format version, section count
+SECTION = struct.Struct('<16sQQ')     # name, offset, byte length
+NONE = 0xFFFFFFFF
+
+# Automata stored in a lexicon: lowercased definitions (-> reverse entries) for query
+# enrichment, and multi-word / hyphenated acronym keys (-> forward entries) for claim rewriting.
+AUTOMATA = ('definitions', 'phrases')
+AUTOMATON_ARRAYS = ('edge_start', 'edge_char', 'edge_target', 'fail', 'depth', 'output', 'dict_link')
+
+def _lower(text: str) -> str:
+    # str.lower() can change the length of a few characters (e.g. U+0130); keep offsets aligned
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return ''.join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+def _is_word_char(c: str) -> bool:
+    return c.isalnum() or c == '_'
+
+def _is_boundary(text: str, i: int) -> bool:
+    # Same rule as the regex \b: a word character on exactly one side of position i
+    before = i > 0 and _is_word_char(text[i - 1])
+    after = i < len(text) and _is_word_char(text[i])
+    return before != after
+
+class PhraseAutomaton:
+    """
+    Aho-Corasick automaton over lowercased phrases, stored as flat uint32 arrays.
+
+    Each state's outgoing edges are a slice of (edge_char, edge_target) sorted by code point;
+    a state that completes a phrase carries that phrase's value, and dict_link points to the
+    next state on its failure chain that does, so every phrase ending at a position is found
+    without rescanning. Matching costs O(len(text)) regardless of the number of phrases.
+    """
+
+    def __init__(self, arrays: Dict[str, 'memoryview']):
+        for name in AUTOMATON_ARRAYS:
+            setattr(self, name, arrays[name])
+
+    @staticmethod
+    def build(phrases: List[Tuple[str, int]]) -> Dict[str, array]:
+        """Compiles (phrase, value) pairs into the array layout. Phrases must be lowercased."""
+        children: List[Dict[str, int]] = [{}]
+        depth = [0]
+        output = [NONE]
+        for phrase, value in phrases:
+            state = 0
+            for c in phrase:
+                nxt = children[state].get(c)
+                if nxt is None:
+                    nxt = len(children)
+                    children[state][c] = nxt
+                    children.append({})
+                    depth.append(depth[state] + 1)
+                    output.append(NONE)
+                state = nxt
+            if output[state] == NONE:
+                output[state] = value
+
+        # Breadth-first failure links
+        fail = [0] * len(children)
+        dict_link = [NONE] * len(children)
+        queue = list(children[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for c, nxt in children[state].items():
+                f = fail[state]
+                while f and c not in children[f]:
+                    f = fail[f]
+                target = children[f].get(c, 0)
+                fail[nxt] = target if target != nxt else 0
+                dict_link[nxt] = fail[nxt] if output[fail[nxt]] != NONE else dict_link[fail[nxt]]
+                queue.append(nxt)
+
+        edge_start = array('I', [0])
+        edge_char = array('I')
+        edge_target = array('I')
+        for edges in children:
+            for c in sorted(edges):
+                edge_char.append(ord(c))
+                edge_target.append(edges[c])
+            edge_start.append(len(edge_char))
+
+        return {
+            'edge_start': edge_start,
+            'edge_char': edge_char,
+            'edge_target': edge_target,
+            'fail': array('I', fail),
+            'depth': array('I', depth),
+            'output': array('I', output),
+            'dict_link': array('I', dict_link),
+        }
+
+    def _goto(self, state: int, code: int) -> int:
+        edge_char = self.edge_char
+        lo, hi = self.edge_start[state], self.edge_start[state + 1]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if edge_char[mid] < code:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.edge_start[state + 1] and edge_char[lo] == code:
+            return self.edge_target[lo]
+        return NONE
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        """Yields (start, end, value) for every phrase occurrence, overlapping ones included."""
+        state = 0
+        for i, c in enumerate(_lower(text)):
+            code = ord(c)
+            while True:
+                nxt = self._goto(state, code)
+                if nxt != NONE or state == 0:
+                    break
+                state = self.fail[state]
+            state = nxt if nxt != NONE else 0
+
+            hit = state if self.output[state] != NONE else self.dict_link[state]
+            while hit != NONE:
+                yield i + 1 - self.depth[hit], i + 1, self.output[hit]
+                hit = self.dict_link[hit]
+
+    def find_longest(self, text: str, word_boundaries: bool = True) -> List[Tuple[int, int, int]]:
+        """
+        Returns non-overlapping (start, end, value) matches, preferring the leftmost and then
+        the longest phrase. With word_boundaries, both ends must sit on a word boundary (\\b).
+        """
+        candidates = []
+        for start, end, value in self.iter_matches(text):
+            if word_boundaries and not (_is_boundary(text, start) and _is_boundary(text, end)):
+                continue
+            candidates.append((start, -end, value))
+        candidates.sort()
+
+        matches = []
+        position = 0
+        for start, neg_end, value in candidates:
+            if start >= position:
+                matches.append((start, -neg_end, value))
+                position = -neg_end
+        return matches
+
+class _StringTable:
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __getitem__(self, i: int) -> str:
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], 'utf-8')
+
+class LexiconMap(Mapping):
+    """Read-only str -> str mapping backed by sorted key/value string ids in the lexicon."""
+
+    def __init__(self, strings: _StringTable, keys, values):
+        self._strings = strings
+        self._keys = keys
+        self._values = values
+
+    def key_at(self, i: int) -> str:
+        return self._strings[self._keys[i]]
+
+    def value_at(self, i: int) -> str:
+        return self._strings[self._values[i]]
+
+    def index(self, key: str) -> int:
+        lo, hi = 0, len(self._keys)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self._keys) and self.key_at(lo) == key:
+            return lo
+        return -1
+
+    def __getitem__(self, key):
+        if not isinstance(key, str):
+            raise KeyError(key)
+        i = self.index(key)
+        if i < 0:
+            raise KeyError(key)
+        return self.value_at(i)
+
+    def __contains__(self, key):
+        return isinstance(key, str) and self.index(key) >= 0
+
+    def __iter__(self):
+        for i in range(len(self._keys)):
+            yield self.key_at(i)
+
+    def __len__(self):
+        return len(self._keys)
+
+class Lexicon:
+    """
+    Acronym lexicon loaded from a compiled artifact (see write_lexicon).
+
+    forward maps acronym keys to definitions, reverse maps lowercased definitions to acronyms,
+    and the automata match definitions and multi-word keys in free text. The artifact is
+    memory-mapped, so loading is O(1) and the pages are shared by every process using it.
+    """
+
+    def __init__(self, buffer, source: Optional[str] = None):
+        self.source = source
+        self._buffer = buffer
+        view = memoryview(buffer)
+        magic, version, count = HEADER.unpack_from(view, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f'Not a lexicon artifact (or unsupported version): {source}')
+
+        sections = {}
+        for k in range(count):
+            name, offset, length = SECTION.unpack_from(view, HEADER.size + k * SECTION.size)
+            sections[name.rstrip(b'\0').decode('ascii')] = view[offset:offset + length]
+
+        def uint32(name):
+            data = sections[name].cast('I')
+            if sys.byteorder != 'little':
+                data = array('I', data)
+                data.byteswap()
+            return data
+
+        strings = _StringTable(sections['strings'], uint32('string_offsets'))
+        self.forward = LexiconMap(strings, uint32('forward_keys'), uint32('forward_values'))
+        self.reverse = LexiconMap(strings, uint32('reverse_keys'), uint32('reverse_values'))
+        self.automata = {
+            automaton: PhraseAutomaton({name: uint32(f'{automaton[:3]}.{name}') for name in AUTOMATON_ARRAYS})
+            for automaton in AUTOMATA
+        }
+
+    @property
+    def definitions(self) -> PhraseAutomaton:
+        """Matches lowercased definitions; match values index into reverse."""
+        return self.automata['definitions']
+
+    @property
+    def phrases(self) -> PhraseAutomaton:
+        """Matches multi-word and hyphenated forward keys; match values index into forward."""
+        return self.automata['phrases']
+
+    @classmethod
+    def open(cls, path: str) -> 'Lexicon':
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer, source=path)
+
+def is_phrase_key(key: str) -> bool:
+    return ' ' in key or '-' in key
+
+def encode_lexicon(forward: Dict[str, str], reverse: Dict[str, str]) -> bytes:
+    """Serializes forward/reverse maps and their phrase automata into the artifact format."""
+    strings: Dict[str, int] = {}
+
+    def intern(value: str) -> int:
+        if value not in strings:
+            strings[value] = len(strings)
+        return strings[value]
+
+    forward_keys = sorted(forward)
+    reverse_keys = sorted(reverse)
+    arrays = {
+        'forward_keys': array('I', [intern(k) for k in forward_keys]),
+        'forward_values': array('I', [intern(forward[k]) for k in forward_keys]),
+        'reverse_keys': array('I', [intern(k) for k in reverse_keys]),
+        'reverse_values': array('I', [intern(reverse[k]) for k in reverse_keys]),
+    }
+
+    automata = {
+        'definitions': [(key, i) for i, key in enumerate(reverse_keys)],
+        'phrases': [(_lower(key), i) for i, key in enumerate(forward_keys) if is_phrase_key(key)],
+    }
+    for automaton, phrases in automata.items():
+        for name, data in PhraseAutomaton.build(phrases).items():
+            arrays[f'{automaton[:3]}.{name}'] = data
+
+    blob = bytearray()
+    offsets = array('I', [0])
+    for value in strings:
+        blob += value.encode('utf-8')
+        offsets.append(len(blob))
+    arrays['string_offsets'] = offsets
+
+    payloads = {'strings': bytes(blob)}
+    for name, data in arrays.items():
+        if sys.byteorder != 'little':
+            data = array('I', data)
+            data.byteswap()
+        payloads[name] = data.tobytes()
+
+    table_size = HEADER.size + SECTION.size * len(payloads)
+    out = bytearray(table_size)
+    HEADER.pack_into(out, 0, MAGIC, FORMAT_VERSION, len(payloads))
+    for k, (name, payload) in enumerate(payloads.items()):
+        out += b'\0' * (-len(out) % 8)  # keep every array 8-byte aligned for cast()
+        SECTION.pack_into(out, HEADER.size + k * SECTION.size, name.encode('ascii'), len(out), len(payload))
+        out += payload
+    return bytes(out)
+
+def write_lexicon(path: str, forward: Dict[str, str], reverse: Dict[str, str]):
+    data = encode_lexicon(forward, reverse)
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    # A unique temp file per writer: processes building the lexicon at once never share one
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.lexicon-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+_lexicons: Dict[tuple, Lexicon] = {}
+_lexicons_lock = threading.Lock()
+
+def load_lexicon(acronyms_path: str = DEFAULT_ACRONYMS_PATH,
+                 custom_path: Optional[str] = DEFAULT_CUSTOM_ACRONYMS_PATH,
+                 lexicon_path: Optional[str] = None) -> Lexicon:
+    """
+    Returns the lexicon for the given acronym sources, memoized per process.
+
+    The compiled artifact is (re)built by VocabularyBuilder when it is missing or older than
+    its JSON sources; if it cannot be written, the lexicon is compiled into memory instead.
+    """
+    if lexicon_path is None:
+        is_default = os.path.abspath(acronyms_path) == DEFAULT_ACRONYMS_PATH
+        lexicon_path = DEFAULT_LEXICON_PATH if is_default else os.path.splitext(acronyms_path)[0] + '.lex'
+    key = (os.path.abspath(acronyms_path), custom_path and os.path.abspath(custom_path), os.path.abspath(lexicon_path))
+
+    with _lexicons_lock:
+        lexicon = _lexicons.get(key)
+        if lexicon is None:
+            lexicon = _open_or_compile(acronyms_path, custom_path, lexicon_path)
+            _lexicons[key] = lexicon
+        return lexicon
+
+def _open_or_compile(acronyms_path, custom_path, lexicon_path) -> Lexicon:
+    sources = [p for p in (acronyms_path, custom_path) if p and os.path.exists(p)]
+    if os.path.exists(lexicon_path):
+        artifact_mtime = os.path.getmtime(lexicon_path)
+        if all(os.path.getmtime(p) <= artifact_mtime for p in sources):
+            try:
+                return Lexicon.open(lexicon_path)
+            except ValueError as e:
+                print(f'Warning: {e}; recompiling.')
+
+    from refinery.vocabulary import VocabularyBuilder
+
+    builder = VocabularyBuilder()
+    builder.load_acronyms(acronyms_path, custom_path)
+    try:
+        builder.save_lexicon(lexicon_path)
+        return Lexicon.open(lexicon_path)
+    except OSError as e:
+        print(f'Warning: Could not write lexicon {lexicon_path} ({e}); compiling in memory.')
+        forward, reverse = builder.lexicon_maps()
+        return Lexicon(encode_lexicon(forward, reverse), source=acronyms_path)
@@ -0,0 +1,113 @@
+import os
+import re
+import sys
+import threading
+import unicodedata
+from collections import namedtuple
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crawler import config
+
+NLP_MODES = ('full', 'fast', 'rule')
+
+RuleToken = namedtuple('RuleToken', ['text', 'is_stop', 'is_punct', 'is_space'])
+
+# Approximates the spaCy English tokenizer on claim/query text: abbreviations ("e.g.") and
+# dotted numbers stay whole, negations and clitics split off ("don't" -> "do", "n't"), hyphens
+# and other punctuation become their own tokens.
+RULE_TOKEN_PATTERN = re.compile(
+    r"(?:[a-z]\.){2,}|\d+(?:[.,]\d+)+|\w+(?=n't\b)|n't\b|'(?:s|d|ll|m|re|ve)\b|\w+|[^\w\s]",
+    re.IGNORECASE
+)
+
+def _is_punct(text: str) -> bool:
+    return all(unicodedata.category(c).startswith('P') for c in text)
+
+class RuleTokenizer:
+    """
+    Dependency-free stand-in for a spaCy pipeline that only tokenizes.
+
+    Calling it returns a list of RuleToken with the attributes the processors read
+    (text, is_stop, is_punct, is_space), using spaCy's English stop list.
+    """
+
+    def __init__(self):
+        from refinery.stop_words import STOP_WORDS
+
+        self.stop_words = STOP_WORDS
+
+    def __call__(self, text: str) -> List[RuleToken]:
+        tokens = []
+        for match in RULE_TOKEN_PATTERN.finditer(text):
+            token = match.group()
+            tokens.append(RuleToken(
+                token,
+                token in self.stop_words or token.lower() in self.stop_words,
+                _is_punct(token),
+                False
+            ))
+        return tokens
+
+    def pipe(self, texts: Iterable[str], batch_size: int = 1000) -> Iterator[List[RuleToken]]:
+        """Streams tokenized texts, mirroring Language.pipe (batching has no effect here)."""
+        for text in texts:
+            yield self(text)
+
+def _load_spacy_model(model: str):
+    import spacy
+
+    try:
+        return spacy.load(model)
+    except OSError:
+        print(f"Downloading spaCy model {model}...")
+        from spacy.cli import download
+        download(model)
+        return spacy.load(model)
+
+_pipelines: Dict[str, object] = {}
+_pipelines_lock = threading.Lock()
+
+def load_nlp(mode: Optional[str] = None):
+    """
+    Returns the tokenization pipeline for the given mode (default: config.NLP_MODE), memoized
+    per process.
+
+    'full' loads the complete en_core_web_sm pipeline (downloading it if needed); 'fast' is
+    spaCy's blank English pipeline, i.e. the same tokenizer and stop list without the model;
+    'rule' is RuleTokenizer and does not import spaCy at all.
+    """
+    mode = mode or config.NLP_MODE
+    if mode not in NLP_MODES:
+        raise ValueError(f'Unknown NLP mode: {mode}')
+
+    with _pipelines_lock:
+        nlp = _pipelines.get(mode)
+        if nlp is None:
+            if mode == 'full':
+                nlp = _load_spacy_model(config.SPACY_MODEL)
+            elif mode == 'fast':
+                import spacy
+
+                nlp = spacy.blank('en')
+            else:
+                nlp = RuleTokenizer()
+            _pipelines[mode] = nlp
+        return nlp
+
+def load_sentencizer():
+    """
+    Returns spaCy's blank English pipeline with only the rule-based sentencizer, memoized per
+    process. No model is loaded, so segmenting a window costs little more than tokenizing it.
+    """
+    with _pipelines_lock:
+        nlp = _pipelines.get('sentencizer')
+        if nlp is None:
+            import spacy
+
+            nlp = spacy.blank('en')
+            nlp.add_pipe('sentencizer')
+            _pipelines['sentencizer'] = nlp
+        return nlp
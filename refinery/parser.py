@@ -1,42 +1,65 @@
 import os
 import json
 from docx import Document
-from docx.oxml.ns import qn
 import sys
-from dataclasses import dataclass, asdict
-from typing import List, Dict, Optional
+from typing import List, Optional
 
 # Add project root to sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from brain.chunks import ChunkStore
 from refinery.classifier import DocumentClassifier
+from refinery.docx_stream import clean_paragraph_text, iter_blocks
 
-@dataclass
-class Chunk:
-    text: str
-    metadata: Dict[str, str]
+# "docx" builds the python-docx object model; "fast" stream-parses word/document.xml in one pass
+PARSE_MODES = ("docx", "fast")
+
+# Bump a mode's version whenever its output changes; cached results of older versions are reparsed.
+# Changes to the shared scanners or _build_body affect both modes.
+PARSER_VERSIONS = {"docx": 2, "fast": 2}
 
 class TDocParser:
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, mode: str = "docx", classifier: Optional[DocumentClassifier] = None, cache=None):
+        if mode not in PARSE_MODES:
+            raise ValueError(f"Unknown parse mode: {mode}")
         self.file_path = file_path
+        self.mode = mode
         self.doc = None
         self.metadata = {}
         self.content = ""
-        self.chunks: List[Chunk] = []
+        self.chunks = ChunkStore()
         self.cr_fields = {}
-        self.classifier = DocumentClassifier()
+        self.error = None
+        # Batch callers pass a shared classifier instead of building one per document
+        self.classifier = classifier or DocumentClassifier()
+        # Optional refinery.cache.ParseCache; classification is cheap and always re-run on a hit
+        self.cache = cache
 
-    def parse(self):
-        """Main parsing method."""
+    def parse(self, columnar: bool = False):
+        """
+        Main parsing method. "chunks" in the result is a list of {"text", "metadata"} dicts, or
+        with columnar the ChunkStore.to_json() column layout, which skips building those dicts.
+        """
         if not os.path.exists(self.file_path):
             print(f"Error: File not found {self.file_path}")
+            self.error = "File not found"
             return None
 
         try:
-            self.doc = Document(self.file_path)
-            self._extract_metadata()
-            self._extract_cr_fields()
-            self._extract_body_text_and_chunks()
+            digest = self.cache.file_hash(self.file_path) if self.cache else None
+            cached = self.cache.get(digest, self.mode, PARSER_VERSIONS[self.mode]) if self.cache else None
+            if cached is not None:
+                self._load_cached(cached)
+            else:
+                if self.mode == "fast":
+                    self._parse_stream()
+                else:
+                    self.doc = Document(self.file_path)
+                    self._extract_table_fields()
+                    self._extract_metadata()
+                    self._extract_body_text_and_chunks()
+                if self.cache:
+                    self.cache.put(digest, self.mode, PARSER_VERSIONS[self.mode], self._cacheable_result())
             
             doc_type = self.classifier.classify(self.content, self.metadata)
             self.metadata["type"] = doc_type
@@ -45,65 +68,92 @@ class TDocParser:
                 "metadata": self.metadata,
                 "cr_fields": self.cr_fields,
                 "content": self.content,
-                "chunks": [asdict(c) for c in self.chunks]
+                # JSON-serializable either way; the ChunkStore itself stays on self.chunks
+                "chunks": self.chunks.to_json() if columnar else self.chunks.to_dicts()
             }
             
         except Exception as e:
             print(f"Error parsing {self.file_path}: {e}")
+            self.error = f"{type(e).__name__}: {e}"
             return None
 
-    def _extract_metadata(self):
-        """Extracts metadata from the document header/first page."""
-        # Check tables first (for CRs)
+    def _cacheable_result(self):
+        return {
+            "metadata": dict(self.metadata),
+            "cr_fields": self.cr_fields,
+            "content": self.content,
+            "chunks": self.chunks.to_json()
+        }
+
+    def _load_cached(self, cached):
+        self.metadata = cached["metadata"]
+        self.cr_fields = cached["cr_fields"]
+        self.content = cached["content"]
+        self.chunks = ChunkStore.from_json(cached["chunks"])
+
+    def _scan_cell_for_metadata(self, text: str):
+        """Picks Source/Title out of a stripped table cell."""
+        metadata = self.metadata
+        if text.startswith("Source:"):
+            metadata["source"] = text.replace("Source:", "").strip()
+        elif "Source:" in text:
+            parts = text.split("Source:")
+            if len(parts) > 1:
+                metadata["source"] = parts[1].strip()
+        
+        if text.startswith("Title:"):
+            metadata["title"] = text.replace("Title:", "").strip()
+        elif "Title:" in text:
+            parts = text.split("Title:")
+            if len(parts) > 1:
+                metadata["title"] = parts[1].strip()
+
+    def _scan_row(self, cell_texts: List[str]):
+        """Extracts metadata and CR fields (Reason/Summary of Change) from one row of stripped cell texts."""
+        for i, text in enumerate(cell_texts):
+            self._scan_cell_for_metadata(text)
+
+            label = text.lower()
+            if "reason for change" in label:
+                if i + 1 < len(cell_texts):
+                    self.cr_fields["reason_for_change"] = cell_texts[i+1]
+            elif "summary of change" in label:
+                if i + 1 < len(cell_texts):
+                    self.cr_fields["summary_of_change"] = cell_texts[i+1]
+
+    def _extract_table_fields(self):
+        """Extracts metadata and CR fields from the tables (CR cover sheets) in a single walk."""
         for table in self.doc.tables:
             for row in table.rows:
-                for cell in row.cells:
-                    text = cell.text.strip()
-                    if text.startswith("Source:"):
-                        self.metadata["source"] = text.replace("Source:", "").strip()
-                    elif "Source:" in text:
-                        parts = text.split("Source:")
-                        if len(parts) > 1:
-                            self.metadata["source"] = parts[1].strip()
-                    
-                    if text.startswith("Title:"):
-                        self.metadata["title"] = text.replace("Title:", "").strip()
-                    elif "Title:" in text:
-                        parts = text.split("Title:")
-                        if len(parts) > 1:
-                            self.metadata["title"] = parts[1].strip()
-
-        # Check paragraphs (for LS) if missing
+                self._scan_row([cell.text.strip() for cell in row.cells])
+
+    def _extract_metadata(self):
+        """Falls back to the header paragraphs (for LS) for metadata the tables did not provide."""
         if not self.metadata.get("source") or not self.metadata.get("title"):
             for para in self.doc.paragraphs[:30]: # Check first 30 paragraphs
                 text = para.text.strip()
-                if not self.metadata.get("source"):
-                    if text.startswith("Source:"):
-                        self.metadata["source"] = text.replace("Source:", "").strip()
-                if not self.metadata.get("title"):
-                    if text.startswith("Title:"):
-                        self.metadata["title"] = text.replace("Title:", "").strip()
-
-    def _extract_cr_fields(self):
-        """Extracts Reason for Change and Summary of Change from CRs."""
-        for table in self.doc.tables:
-            for row in table.rows:
-                for i, cell in enumerate(row.cells):
-                    text = cell.text.strip().lower()
-                    if "reason for change" in text:
-                        if i + 1 < len(row.cells):
-                            self.cr_fields["reason_for_change"] = row.cells[i+1].text.strip()
-                    elif "summary of change" in text:
-                        if i + 1 < len(row.cells):
-                            self.cr_fields["summary_of_change"] = row.cells[i+1].text.strip()
+                self._scan_paragraph_for_metadata(text)
+
+    def _scan_paragraph_for_metadata(self, text: str):
+        if not self.metadata.get("source"):
+            if text.startswith("Source:"):
+                self.metadata["source"] = text.replace("Source:", "").strip()
+        if not self.metadata.get("title"):
+            if text.startswith("Title:"):
+                self.metadata["title"] = text.replace("Title:", "").strip()
 
     def _extract_body_text_and_chunks(self):
         """Extracts the main body text and creates chunks, handling Track Changes."""
+        self._build_body(self._get_para_text_clean(para) for para in self.doc.paragraphs)
+
+    def _build_body(self, para_texts):
         full_text = []
         current_section = "General"
+        # Chunks share one copy of the document metadata (taken before classification adds "type")
+        doc = self.chunks.add_document(dict(self.metadata))
+        offset = 0
         
-        for para in self.doc.paragraphs:
-            text = self._get_para_text_clean(para)
+        for text in para_texts:
             if not text:
                 continue
                 
@@ -114,38 +164,41 @@ class TDocParser:
             full_text.append(text)
             
             if len(text) > 20: 
-                chunk_metadata = self.metadata.copy()
-                chunk_metadata["section"] = current_section
-                self.chunks.append(Chunk(text=text, metadata=chunk_metadata))
+                self.chunks.add(text, doc, section=current_section, start=offset, end=offset + len(text))
+            offset += len(text) + 1
         
         self.content = "\n".join(full_text)
 
     def _get_para_text_clean(self, paragraph):
         """Extracts text from a paragraph, ignoring deletions and including insertions."""
-        text = ""
         try:
-            p_element = paragraph._element
-            for child in p_element:
-                tag = child.tag
-                if tag.endswith('r'): # Normal run
-                    if child.text:
-                        text += child.text
-                elif tag.endswith('ins'): # Insertion
-                    for sub in child:
-                        if sub.tag.endswith('r'):
-                            if sub.text:
-                                text += sub.text
-                elif tag.endswith('del'): # Deletion
-                    pass
-                elif tag.endswith('hyperlink'):
-                    for sub in child:
-                         if sub.tag.endswith('r'):
-                            if sub.text:
-                                text += sub.text
+            return clean_paragraph_text(paragraph._element)
         except Exception:
             return paragraph.text.strip()
-                            
-        return text.strip()
+
+    def _parse_stream(self):
+        """
+        Fast path: one streaming pass over word/document.xml, without the python-docx object model.
+        Produces the same metadata, CR fields and chunks as the docx path.
+        """
+        header_paragraphs = []
+        body_texts = []
+        
+        for block in iter_blocks(self.file_path, plain_paragraphs=30):
+            if block[0] == "row":
+                self._scan_row([text.strip() for text in block[1]])
+            else:
+                _, clean_text, text = block
+                if text is not None:
+                    header_paragraphs.append(text.strip())
+                body_texts.append(clean_text)
+        
+        # Tables take precedence over header paragraphs, as in the docx path
+        if not self.metadata.get("source") or not self.metadata.get("title"):
+            for text in header_paragraphs:
+                self._scan_paragraph_for_metadata(text)
+        
+        self._build_body(body_texts)
 
 if __name__ == "__main__":
     # Simple test if run directly
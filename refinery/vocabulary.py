@@ -3,17 +3,20 @@ import os
 # Add project root to sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import argparse
 import zipfile
 import json
-from docx import Document
+from typing import Dict, Optional, Tuple
 from crawler import config
+from refinery.lexicon import DEFAULT_ACRONYMS_PATH, DEFAULT_CUSTOM_ACRONYMS_PATH, DEFAULT_LEXICON_PATH, write_lexicon
 
 class VocabularyBuilder:
-    def __init__(self, vocabulary_zip_path: str):
+    def __init__(self, vocabulary_zip_path: Optional[str] = None):
         self.zip_path = vocabulary_zip_path
-        self.extract_dir = os.path.dirname(vocabulary_zip_path)
+        self.extract_dir = os.path.dirname(vocabulary_zip_path) if vocabulary_zip_path else None
         self.doc_path = None
         self.acronyms = {}
+        self.custom_acronyms = {}
         # Manual overrides for terms known to be missing or critical
         self.manual_overrides = {
             "NR": "New Radio",
@@ -21,6 +24,15 @@ class VocabularyBuilder:
             "eNB": "eNodeB; Evolved Node B",
             "UE": "User Equipment",
         }
+        # Curated definition -> acronym pairs for query enrichment. They win over the derived
+        # reverse map and cover terms that 21.905 lacks or lists under an ambiguous acronym.
+        self.reverse_overrides = {
+            "beam failure recovery": "BFR",
+            "beam failure detection": "BFD",
+            "radio resource control": "RRC",
+            "downlink control information": "DCI",
+            "uplink control information": "UCI",
+        }
 
     def extract_zip(self):
         """Extracts the vocabulary zip file."""
@@ -39,6 +51,8 @@ class VocabularyBuilder:
             print("No .docx file found to parse.")
             return
 
+        from docx import Document
+
         print(f"Parsing {self.doc_path}...")
         doc = Document(self.doc_path)
         
@@ -97,6 +111,64 @@ class VocabularyBuilder:
         with open(output_path, 'w') as f:
             json.dump(self.acronyms, f, indent=4)
 
+    def load_acronyms(self, acronyms_path: str, custom_path: Optional[str] = None):
+        """Loads a curated acronym dictionary (e.g. acronyms_final.json) and optional custom phrases."""
+        self.acronyms = {}
+        if os.path.exists(acronyms_path):
+            with open(acronyms_path, 'r', encoding='utf-8') as f:
+                self.acronyms = json.load(f)
+        else:
+            print(f"Warning: Acronyms file {acronyms_path} not found. Using empty dict.")
+        self.custom_acronyms = {}
+        if custom_path and os.path.exists(custom_path):
+            with open(custom_path, 'r', encoding='utf-8') as f:
+                self.custom_acronyms = json.load(f)
+
+    def lexicon_maps(self) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """
+        Returns the (forward, reverse) maps of the lexicon.
+
+        forward is the acronym dictionary with the custom phrases layered on top; custom
+        phrases are rewrite rules, not definitions, so they stay out of reverse.
+
+        reverse maps lowercased definitions to acronyms, for tagging queries. Only unambiguous
+        pairs are kept: acronyms with a single definition (definitions are ';'-separated, and
+        merged senses like 'Dedicated Channel; Downlink Control Information' would tag the wrong
+        one), definitions that no other acronym shares, and multi-word definitions (a tag after
+        every 'transmit' or 'handover' is noise). reverse_overrides are added on top.
+        """
+        forward = dict(self.acronyms)
+        forward.update(self.custom_acronyms)
+
+        definitions = {}
+        owners: Dict[str, set] = {}
+        for acr, defn in self.acronyms.items():
+            parts = [part.strip() for part in defn.split(';')]
+            parts = [part.lower() for part in parts if len(part) > 1] # Ignore single chars
+            definitions[acr] = parts
+            for part in parts:
+                owners.setdefault(part, set()).add(acr)
+
+        reverse = {}
+        for acr, parts in definitions.items():
+            if len(parts) == 1 and len(owners[parts[0]]) == 1 and len(parts[0].split()) > 1:
+                reverse[parts[0]] = acr
+        reverse.update(self.reverse_overrides)
+        return forward, reverse
+
+    def save_lexicon(self, output_path: str):
+        """Compiles the forward/reverse maps and phrase automata into a memory-mappable artifact."""
+        forward, reverse = self.lexicon_maps()
+        print(f"Compiling lexicon ({len(forward)} acronyms, {len(reverse)} definitions) to {output_path}...")
+        write_lexicon(output_path, forward, reverse)
+
+def build_lexicon(acronyms_path: str = DEFAULT_ACRONYMS_PATH,
+                  custom_path: str = DEFAULT_CUSTOM_ACRONYMS_PATH,
+                  output_path: str = DEFAULT_LEXICON_PATH):
+    builder = VocabularyBuilder()
+    builder.load_acronyms(acronyms_path, custom_path)
+    builder.save_lexicon(output_path)
+
 def build_vocabulary():
     zip_path = os.path.join(config.BASE_DOWNLOAD_DIR, "Specs", "21_series", "21.905", "21905-j00.zip")
     if not os.path.exists(zip_path):
@@ -111,4 +183,11 @@ def build_vocabulary():
     builder.save_acronyms(output_path)
 
 if __name__ == "__main__":
-    build_vocabulary()
+    parser = argparse.ArgumentParser(description="Build the 3GPP acronym vocabulary.")
+    parser.add_argument("--lexicon", action="store_true", help="Compile the acronym lexicon artifact from the curated JSON files")
+    args = parser.parse_args()
+
+    if args.lexicon:
+        build_lexicon()
+    else:
+        build_vocabulary()
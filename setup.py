@@ -0,0 +1,17 @@
+"""
+Packages the project modules that Apache Beam workers import (brain, crawler, refinery).
+
+Passed to Dataflow as --setup_file by brain/pipeline_dataflow.py; workers install it before
+running the pipeline, so the shared chunker behaves the same there as in local runs.
+"""
+import setuptools
+
+setuptools.setup(
+    name='invention-platform',
+    version='0.1.0',
+    packages=['brain', 'crawler', 'refinery'],
+    install_requires=[
+        # refinery.nlp's sentencizer (--segmentation spacy); no model download needed
+        'spacy==3.8.2',
+    ],
+)
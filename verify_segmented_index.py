@@ -0,0 +1,100 @@
+import os
+import shutil
+import sys
+import tempfile
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from brain.index_store import SegmentedIndex, open_index
+
+EMBEDDING_MODEL = 'verify'
+
+def make_chunks(source, count, meeting='RAN1_104e'):
+    return [
+        {
+            'text': f'{source} chunk {i} sidelink wake-up indication',
+            'embedding': [float(i + 1), 1.0, 0.0, 0.5],
+            'metadata': {'source': source, 'meeting': meeting},
+        }
+        for i in range(count)
+    ]
+
+def check(name, actual, expected):
+    if actual == expected:
+        print(f'PASS: {name}: {actual}')
+        return True
+    print(f'FAIL: {name}: got {actual}, expected {expected}')
+    return False
+
+def check_reader(path, count, sources, meetings):
+    reader = open_index(path)
+    try:
+        ok = check('live rows', len(reader), count)
+        ok &= check('live sources', sorted(reader.unique_values('source')), sources)
+        ok &= check('live meetings', sorted(reader.unique_values('meeting')), meetings)
+        ok &= check('source filter rows', int(reader.filter_mask({'source': sources}).sum()), count)
+        ok &= check('bm25 scores', len(reader.bm25_scores(['sidelink'])), count)
+        return ok
+    finally:
+        reader.close()
+
+def verify_segmented_index():
+    print('Verifying Segmented Index...')
+    path = tempfile.mkdtemp(prefix='verify-index-')
+    try:
+        index = SegmentedIndex(path, max_segments=4)
+        ok = True
+
+        # 1. Adds: one segment each
+        print('\nTest 1: add')
+        index.add(make_chunks('R1-001', 3), EMBEDDING_MODEL)
+        index.add(make_chunks('R1-002', 2), EMBEDDING_MODEL)
+        index.add(make_chunks('R1-003', 4, meeting='RAN1_105e'), EMBEDDING_MODEL)
+        ok &= check('segments', len(index.segments()), 3)
+        ok &= check_reader(path, 9, ['R1-001', 'R1-002', 'R1-003'], ['RAN1_104e', 'RAN1_105e'])
+
+        # 2. Upsert: re-indexing R1-002 replaces its old chunks
+        print('\nTest 2: add with replace_field')
+        index.add(make_chunks('R1-002', 5), EMBEDDING_MODEL, replace_field='source')
+        ok &= check('deleted rows', sum(segment['deleted'] for segment in index.segments()), 2)
+        ok &= check_reader(path, 12, ['R1-001', 'R1-002', 'R1-003'], ['RAN1_104e', 'RAN1_105e'])
+
+        # 3. Deletes: values left only on deleted rows disappear from the filter options
+        print('\nTest 3: delete_where')
+        ok &= check('deleted by delete_where', index.delete_where('source', ['R1-003']), 4)
+        ok &= check_reader(path, 8, ['R1-001', 'R1-002'], ['RAN1_104e'])
+
+        # 4. Mismatched embedding backend is rejected
+        print('\nTest 4: embedding backend check')
+        try:
+            index.add(make_chunks('R1-004', 1), 'other-model')
+            ok &= check('mismatched backend rejected', False, True)
+        except ValueError:
+            ok &= check('mismatched backend rejected', True, True)
+
+        # 5. Compaction drops the deleted rows
+        print('\nTest 5: compact')
+        index.compact()
+        ok &= check('segments after compact', len(index.segments()), 1)
+        ok &= check('deleted rows after compact', index.segments()[0]['deleted'], 0)
+        ok &= check_reader(path, 8, ['R1-001', 'R1-002'], ['RAN1_104e'])
+
+        # 6. Background compaction once there are more than max_segments segments
+        print('\nTest 6: background compaction')
+        for i in range(5):
+            index.add(make_chunks(f'R1-1{i:02d}', 2), EMBEDDING_MODEL)
+        index.wait()
+        ok &= check('segments within limit', len(index.segments()) <= index.max_segments, True)
+        ok &= check_reader(path, 18, ['R1-001', 'R1-002'] + [f'R1-1{i:02d}' for i in range(5)], ['RAN1_104e'])
+
+        leftovers = [name for name in os.listdir(path) if name.startswith('.')]
+        ok &= check('leftover temp files', leftovers, [])
+
+        print('\nPASS: Segmented index verified.' if ok else '\nFAIL: Segmented index checks failed.')
+        return ok
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+if __name__ == '__main__':
+    sys.exit(0 if verify_segmented_index() else 1)